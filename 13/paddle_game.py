@@ -1,105 +1,160 @@
-from typing import Dict, Tuple, DefaultDict, Optional
-from collections import defaultdict
-from time import sleep
-import subprocess
-
-from intcode.intcode import Program, run_until_output
-import numpy as np
-
-TILE_ID_LOOKUP ={
-    0: ' ',  # Empty
-    1: '#',  # Wall
-    2: '+',  # Block
-    3: '-',  # Paddle
-    4: 'o'   # Ball
+from typing import Dict, Tuple, Optional
+import argparse
+import os
+
+from intcode.intcode import Program, run, INTERPRETER_ENGINE, COMPILED_ENGINE
+from intcode import checkpoint
+from intcode.grid import Grid, lookup_table
+from intcode.render import TerminalRenderer
+
+EMPTY, WALL, BLOCK, PADDLE, BALL = 0, 1, 2, 3, 4
+TILE_ID_LOOKUP = {
+    EMPTY: ' ',
+    WALL: '#',
+    BLOCK: '+',
+    PADDLE: '-',
+    BALL: 'o'
 }
-TILE_DRAW_ARRAY = np.array([' ', '#', '+', '-', 'o'])
+TILE_DRAW_ARRAY = lookup_table(TILE_ID_LOOKUP)
+SCORE_POSITION = (-1, 0)
 NEUTRAL, LEFT, RIGHT = 0, -1, 1
 
-Screen = DefaultDict[Tuple[int, int], int]
+Point = Tuple[int, int]
+
 
 class Breakout:
+    '''Plays Breakout by keeping the paddle under the ball.
+
+    Paddle, ball, block count and score are updated as each tile is drawn, so
+    no state needs to be recovered from the screen. The game runs headless
+    unless render is set, in which case at most max_fps frames a second are
+    drawn, each only redrawing the cells changed since the last.
+
+    Game state only changes between runs of the program, so it can be saved
+    as a checkpoint payload and the game resumed from it.
+    '''
 
-    def __init__(self, program: Program):
+    def __init__(
+        self,
+        program: Program,
+        render: bool=False,
+        max_fps: float=30.0,
+        engine: str=INTERPRETER_ENGINE):
         self.program = program
         self.program[0] = 2  # Free to play mode.
-        self.screen: Screen = defaultdict(lambda: 0)
-        self.paddle: Optional[Tuple[int, int]] = None
-        self.ball: Optional[Tuple[int, int]] = None
+        self.engine = engine
+        self.screen = Grid()
+        self.paddle: Optional[Point] = None
+        self.ball: Optional[Point] = None
         self.score: int = 0
+        self.n_blocks = 0
+        self.initial_blocks: Optional[int] = None
+        self.moves = 0
+        self.renderer = TerminalRenderer(max_fps=max_fps) if render else None
 
-    def run_game(self) -> None:
+    @classmethod
+    def from_state(cls, program: Program, state: Dict, **kwargs) -> 'Breakout':
+        '''A game resumed from a checkpointed program and its payload.'''
+        game = cls(program, **kwargs)
+        game.screen = checkpoint.grid_from_state(state['screen'])
+        game.paddle = tuple(state['paddle']) if state['paddle'] else None  # type: ignore
+        game.ball = tuple(state['ball']) if state['ball'] else None  # type: ignore
+        game.score, game.n_blocks = state['score'], state['n_blocks']
+        game.initial_blocks, game.moves = state['initial_blocks'], state['moves']
+        return game
+
+    def state(self) -> Dict:
+        return {
+            'screen': checkpoint.grid_state(self.screen),
+            'paddle': self.paddle,
+            'ball': self.ball,
+            'score': self.score,
+            'n_blocks': self.n_blocks,
+            'initial_blocks': self.initial_blocks,
+            'moves': self.moves,
+        }
+
+    def run_game(self) -> int:
         halt = False
-        prior_screen = None
-        while True:
-            _, _ = run_until_output(self.program, output_len=3)
-            try:
-                x, y, tile_id = self.program.output
-            except ValueError:
-                break
-            if x == -1 and y == 0:
-                self.score = tile_id  # Not really a tile_id...
-            else:
-                self.screen[(x, y)] = tile_id
-            self.draw_screen()
-            #if self.screen == prior_screen:
-            # sleep(0.001)
-            self.paddle, self.ball = game.get_paddle_position(), game.get_ball_position()
-            self.move_paddle_towards_ball()
-            self.program.reset_output()
-            subprocess.call('clear', shell=True)
-        # return screen
-    
+        while not halt:
+            # The game suspends for a joystick move after each frame.
+            _, halt = run(self.program, engine=self.engine)
+            self.read_tiles()
+            if self.initial_blocks is None:
+                self.initial_blocks = self.n_blocks
+            if self.renderer:
+                self.renderer.draw_grid(
+                    self.screen, TILE_DRAW_ARRAY,
+                    footer=f"Score: {self.score} Blocks: {self.n_blocks}",
+                    force=halt)
+            if not halt:
+                self.move_paddle_towards_ball()
+        return self.score
+
+    def read_tiles(self) -> None:
+        output = self.program.output
+        while len(output) >= 3:
+            x, y, tile_id = output.popleft(), output.popleft(), output.popleft()
+            self.update_tile((x, y), tile_id)
+
+    def update_tile(self, position: Point, tile_id: int) -> None:
+        if position == SCORE_POSITION:
+            self.score = tile_id  # Not really a tile_id...
+            return
+        previous = self.screen[position]
+        if previous == tile_id:
+            return
+        self.screen[position] = tile_id
+        if previous == BLOCK:
+            self.n_blocks -= 1
+        if tile_id == BLOCK:
+            self.n_blocks += 1
+        elif tile_id == PADDLE:
+            self.paddle = position
+        elif tile_id == BALL:
+            self.ball = position
+
     def move_paddle_towards_ball(self) -> None:
+        self.moves += 1
         if self.paddle and self.ball:
             dx = self.paddle[0] - self.ball[0]
             if dx == 0:
                 self.program.input.append(NEUTRAL)
             elif dx > 0:
                 self.program.input.append(LEFT)
-            elif dx < 0:
-                self.program.input.append(RIGHT)
             else:
-                raise ValueError
-    
-    def get_position(self, needle: int) -> Optional[Tuple[int, int]]:
-        positions = [position for position, val in self.screen.items() if val == needle]
-        if positions:
-            assert len(positions) == 1
-            return positions[0]
+                self.program.input.append(RIGHT)
         else:
-            return None
-    
-    def get_paddle_position(self) -> Optional[Tuple[int, int]]:
-        return self.get_position(needle=3)
-    
-    def get_ball_position(self) -> Optional[Tuple[int, int]]:
-        return self.get_position(needle=4)
-
-    def draw_screen(self) -> None:
-        if not self.screen:
-            return
-        minx = min(k[0] for k in self.screen)
-        maxx = max(k[0] for k in self.screen)
-        miny = min(k[1] for k in self.screen)
-        maxy = max(k[1] for k in self.screen)
-        area = np.zeros(shape=(maxx - minx + 1, maxy - miny + 1), dtype=int)
-        for (x, y), id in self.screen.items():
-            area[x - minx,  y - miny] = id
-        strrep = TILE_DRAW_ARRAY[area]
-        for row in strrep.T:
-            print(''.join(row))
-        print(f"Score: {self.score}")
-        print(f"Paddle: {self.paddle}")
-        print(f"Ball: {self.ball}")
-
-
-program = Program.from_file(open('./data/game.txt', 'r'))
-game = Breakout(program)
-game.run_game()
-
-#screen = run_game(program)
-#draw_screen(screen)
-
-# n_blocks = sum(val == 2 for val in screen.values())
-# print(f"There are {n_blocks} on screen at exit.")
\ No newline at end of file
+            self.program.input.append(NEUTRAL)
+
+    def summary(self) -> str:
+        return (f"Final score {self.score} after {self.moves} moves, "
+                f"{self.n_blocks} of {self.initial_blocks} blocks remaining.")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Play Breakout to completion.")
+    parser.add_argument('--render', action='store_true', help="Draw the game as it is played.")
+    parser.add_argument('--fps', type=float, default=30.0, help="Frame rate limit when rendering.")
+    parser.add_argument(
+        '--engine', choices=[INTERPRETER_ENGINE, COMPILED_ENGINE], default=INTERPRETER_ENGINE)
+    parser.add_argument('--checkpoint', help="Save the game to this file as it is played.")
+    parser.add_argument(
+        '--every', type=int, default=100000, help="Instructions run between checkpoints.")
+    parser.add_argument(
+        '--resume', action='store_true', help="Resume from the checkpoint if there is one.")
+    args = parser.parse_args()
+
+    options = dict(render=args.render, max_fps=args.fps, engine=args.engine)
+    if args.checkpoint and args.resume and os.path.exists(args.checkpoint):
+        program, state = checkpoint.resume(args.checkpoint, args.every)
+        game = Breakout.from_state(program, state, **options)
+        program.checkpointer.payload = game.state  # type: ignore
+    else:
+        program = Program.from_file(open('./data/game.txt', 'r'))
+        game = Breakout(program, **options)  # type: ignore
+        if args.checkpoint:
+            program.enable_checkpoints(args.checkpoint, args.every, payload=game.state)
+    game.run_game()
+    print(f"There were {game.initial_blocks} blocks on screen at the start.")
+    print(game.summary())
@@ -1,10 +1,16 @@
-from typing import Tuple, Dict, List, Set, Iterable, Optional
-from intcode.intcode import Program, run_until_output
-from time import sleep
+from typing import Dict, Tuple, List, Optional, Sequence
+from multiprocessing import Pool
+import argparse
+import os
+
+from intcode.intcode import Program, run_until_output, INTERPRETER_ENGINE, COMPILED_ENGINE
+from intcode import checkpoint
+from intcode.grid import Grid
+from intcode.search import bfs, grid_neighbors, distance_field
 import numpy as np
 
 Point = Tuple[int, int]
-Map = Dict[Point, int]
+Map = Grid
 
 
 NORTH, SOUTH, WEST, EAST = 1, 2, 3, 4
@@ -15,7 +21,9 @@ TURN_LEFT = {
     NORTH: WEST, WEST: SOUTH, SOUTH: EAST, EAST: NORTH
 }
 UNEXPLORED, EMPTY, WALL, OXYGEN, GAS = 0, 1, 2, 3, 4
+OPEN_TILES = (EMPTY, OXYGEN)
 HIT_WALL, MOVE_SUCCESS, FOUND_OXYGEN = 0, 1, 2
+STATUS_TILES = {HIT_WALL: WALL, MOVE_SUCCESS: EMPTY, FOUND_OXYGEN: OXYGEN}
 
 TILE_DRAW_ARRAY = np.array([' ', ' ', '#', 'o', '~'])
 
@@ -32,148 +40,213 @@ def next_position(position: Point, input: int) -> Point:
     raise ValueError("Unknown direction.")
 
 
-def adjacent_positions(map: Map, position: Point) -> Iterable[Point]:
-    for direction in [NORTH, SOUTH, EAST, WEST]:
-        attempt = next_position(position, direction)
-        if map[attempt] in (EMPTY, OXYGEN):
-            yield attempt
-
-
-def explore(program: Program) -> Map:
-    map: Map = {}
-    position: Point = (0, 0)
-    current_direction, output = NORTH, None
-    # Move north until we hit a wall.
-    while True:
-        program.add_input(current_direction)
-        _, _ = run_until_output(program)
-        output = program.output.pop()
-        if output == MOVE_SUCCESS:
-            position = next_position(position, current_direction)
-            map[position] = EMPTY
-            continue
-        elif output == HIT_WALL:
-            map[next_position(position, current_direction)] = WALL
-            current_direction = TURN_LEFT[current_direction]
-            break
-    # Now the main explore loop. The goal here is to make sure we keep a wall
-    # to the right. We start with a wall to the north of us.
-    have_moved = False
-    while True:
-        program.add_input(current_direction)
-        _, _ = run_until_output(program)
-        output = program.output.pop()
-        if output == HIT_WALL:
-            map[next_position(position, current_direction)] = WALL
-            current_direction = TURN_LEFT[current_direction]
-        elif output == FOUND_OXYGEN:
-            position, have_moved = next_position(position, current_direction), True
-            map[position] = OXYGEN
-        elif output == MOVE_SUCCESS:
-            position, have_moved = next_position(position, current_direction), True
-            map[position] = EMPTY
-            # Check if there is a wall to our right.
-            current_direction = TURN_RIGHT[current_direction]
-            program.add_input(current_direction)
-            _, _ = run_until_output(program)
-            output = program.output.pop()
-            # If we hit a wall, there is still a wall to our right, so we
-            # should keep going.
-            if output == HIT_WALL:
-                map[next_position(position, current_direction)] = WALL
-                current_direction = TURN_LEFT[current_direction]
-            # There is no longer a wall to the right, so we need to turn and
-            # move in that direction.
-            elif output == MOVE_SUCCESS:
-                position = next_position(position, current_direction)
-                map[position] = EMPTY
-            elif output == FOUND_OXYGEN:
-                position = next_position(position, current_direction)
-                map[position] = OXYGEN
+# Phases of the wall following exploration.
+FIND_WALL, FOLLOW_WALL, CHECK_RIGHT = 0, 1, 2
+
+
+class WallFollower:
+    '''Maps the ship by moving north to a wall, then keeping a wall to the
+    droid's right until it is back where it started.
+
+    The follower only changes between moves, so its state can be saved as a
+    checkpoint payload alongside the droid.
+    '''
+
+    def __init__(self) -> None:
+        self.map = Map()
+        self.position: Point = (0, 0)
+        self.direction = NORTH
+        self.phase = FIND_WALL
+        self.have_moved = False
+        self.done = False
+
+    @classmethod
+    def from_state(cls, state: Dict) -> 'WallFollower':
+        follower = cls()
+        follower.map = checkpoint.grid_from_state(state['map'])
+        follower.position = tuple(state['position'])  # type: ignore
+        follower.direction, follower.phase = state['direction'], state['phase']
+        follower.have_moved, follower.done = state['have_moved'], state['done']
+        return follower
+
+    def state(self) -> Dict:
+        return {
+            'map': checkpoint.grid_state(self.map),
+            'position': self.position,
+            'direction': self.direction,
+            'phase': self.phase,
+            'have_moved': self.have_moved,
+            'done': self.done,
+        }
+
+    def update(self, status: int) -> None:
+        '''Record the status of a move in the current direction, and choose
+        the next.'''
+        target = next_position(self.position, self.direction)
+        self.map[target] = STATUS_TILES[status]
+        if status != HIT_WALL:
+            self.position = target
+        if self.phase == FIND_WALL:
+            if status == HIT_WALL:
+                self.direction, self.phase = TURN_LEFT[self.direction], FOLLOW_WALL
+            return
+        if status == HIT_WALL:
+            self.direction = TURN_LEFT[self.direction]
+        elif self.phase == FOLLOW_WALL:
+            self.have_moved = True
+            # After a plain move, check if there is still a wall to our right.
+            if status == MOVE_SUCCESS:
+                self.direction, self.phase = TURN_RIGHT[self.direction], CHECK_RIGHT
+                return
+        self.phase = FOLLOW_WALL
         # We're back where we started, so we can bail.
-        if have_moved and position == (0, 0):
-            break
+        self.done = self.have_moved and self.position == (0, 0)
+
+
+def explore(program: Program, follower: Optional[WallFollower]=None) -> Map:
+    '''Explore with a droid following walls.
+
+    A follower passed in continues with a droid that has already been given
+    the follower's next move, as one resumed from a checkpoint has.
+    '''
+    if follower is None:
+        follower = WallFollower()
+        program.add_input(follower.direction)
+    while not follower.done:
+        run_until_output(program)
+        follower.update(program.output.pop())
+        if not follower.done:
+            program.add_input(follower.direction)
+    return follower.map
+
+
+# The status of a move, and the droid after it unless it hit a wall.
+Probe = Tuple[int, int, Optional[Program]]
+
+
+def probe(droid: Program, directions: Sequence[int], engine: str) -> List[Probe]:
+    '''Try each direction on its own fork of the droid.'''
+    probes = []
+    for direction in directions:
+        fork = droid.fork()
+        fork.add_input(direction)
+        run_until_output(fork, engine=engine)
+        status = fork.output.popleft()
+        probes.append((direction, status, fork if status != HIT_WALL else None))
+    return probes
+
+
+def probe_checkpoint(
+    state: bytes, directions: Sequence[int], engine: str) -> List[Tuple[int, int, Optional[bytes]]]:
+    '''probe for a process pool, with droids passed as checkpoints.'''
+    return [
+        (direction, status, checkpoint.dumps(fork) if fork else None)
+        for direction, status, fork in probe(checkpoint.loads(state), directions, engine)]
+
+
+def explore_frontier(
+    program: Program,
+    processes: Optional[int]=None,
+    engine: str=INTERPRETER_ENGINE) -> Map:
+    '''Explore the whole map breadth first, without ever walking back.
+
+    Every open position keeps the droid that reached it, and each unexplored
+    neighbor is probed by forking that droid, so every position is entered
+    exactly once. With processes, each wave of the frontier is probed in a
+    process pool.
+    '''
+    map = Map()
+    map[(0, 0)] = EMPTY
+    frontier: List[Tuple[Point, Program]] = [((0, 0), program)]
+    pool = Pool(processes) if processes else None
+    try:
+        while frontier:
+            # Each unexplored position is probed from only one neighbor.
+            tasks = []
+            for position, droid in frontier:
+                directions = []
+                for direction in (NORTH, SOUTH, WEST, EAST):
+                    target = next_position(position, direction)
+                    if target not in map:
+                        map[target] = WALL  # Until the probe says otherwise.
+                        directions.append(direction)
+                if directions:
+                    tasks.append((position, droid, directions))
+            if pool:
+                results = [
+                    [(direction, status, checkpoint.loads(state) if state else None)
+                     for direction, status, state in probes]
+                    for probes in pool.starmap(probe_checkpoint, [
+                        (checkpoint.dumps(droid), directions, engine)
+                        for _, droid, directions in tasks])]
+            else:
+                results = [probe(droid, directions, engine) for _, droid, directions in tasks]
+            frontier = []
+            for (position, _, _), probes in zip(tasks, results):
+                for direction, status, fork in probes:
+                    target = next_position(position, direction)
+                    map[target] = STATUS_TILES[status]
+                    if fork:
+                        frontier.append((target, fork))
+    finally:
+        # Every wave has been collected, or an error is on its way out, so
+        # no work is lost by stopping the workers.
+        if pool:
+            pool.terminate()
+            pool.join()
     return map
 
 
 def find_shortest_path(map: Map, origin: Point) -> List[Point]:
-    all_positions = {p for p in map if map[p] in (EMPTY, OXYGEN)}
-    pervious: Dict[Point, Point] = {}
-    distances = {p: 10**4 for p in all_positions}
-    distances[origin] = 0
-    # Dijkstra's algorithm.
-    while all_positions:
-        min_distance_position = min(
-            {p: dist for p, dist in distances.items() if p in all_positions},
-            key=distances.get
-        )
-        all_positions.remove(min_distance_position)
-        if map[min_distance_position] == OXYGEN:
-            break
-        for p in adjacent_positions(map, min_distance_position):
-            alt_distance = distances[min_distance_position] + 1
-            if alt_distance < distances[p]:
-                distances[p] = alt_distance
-                pervious[p] = min_distance_position
-    # Now find the shortet path.
-    path: List[Point] = []
-    current = min_distance_position
-    while current != origin:
-        path.append(current)
-        current = pervious[current]
-    return path
+    goal = get_oxygen_position(map)
+    result = bfs([origin], grid_neighbors(map, OPEN_TILES), goal=goal)
+    return result.path(goal)
 
 def get_oxygen_position(map: Map) -> Point:
-    for p, obj in map.items():
-        if obj == OXYGEN:
-            return p
-    raise ValueError("Oxygen not found.")
+    positions = map.positions(OXYGEN)
+    if not positions:
+        raise ValueError("Oxygen not found.")
+    return positions[0]
 
 def spawn_gas(map: Map, origin: Point) -> int:
-    open_positions = {p for p in map if map[p] in (EMPTY, OXYGEN)}
-    current_gas_boundary: Set[Point] = {origin}
-    has_gas: Set[Point] = {origin}
-    map[origin] = GAS
-    i = 0
-    while has_gas != open_positions:
-        new_gas_boundary: Set[Point] = set()
-        for bdry in current_gas_boundary:
-            for p in adjacent_positions(map, bdry):
-                if p not in has_gas:
-                    map[p] = GAS
-                    has_gas.add(p)
-                    new_gas_boundary.add(p)
-        i += 1
-        current_gas_boundary = new_gas_boundary
-    return i
-
-
-def draw_map(map: Map, position: Optional[Point]=None, path: Optional[List[Point]]=None) -> None:
-    if not map:
-        return
-    minx = min(k[0] for k in map)
-    maxx = max(k[0] for k in map)
-    miny = min(k[1] for k in map)
-    maxy = max(k[1] for k in map)
-    #area = np.zeros(shape=(maxx - minx + 1, maxy - miny + 1), dtype=int)
-    area = np.zeros(shape=(50, 50), dtype=int)
-    for (x, y), id in map.items():
-        area[x - 25,  y - 25] = id
-    strrep = TILE_DRAW_ARRAY[area]
-    if position:
-        strrep[(position[0] - 25, position[1] - 25)] = '@'
-    if path:
-        for p in path:
-            strrep[p[0] - 25, p[1] - 25] = '.'
-    for row in strrep.T:
-        print(''.join(row))
-
-program = Program.from_file(open('./data/program.txt'))
-map = explore(program)
-path = find_shortest_path(map, (0, 0))
-
-# draw_map(map, (0, 0), path[1:])
-# print(f"The shortest path to the oxygen is {len(path)} steps.")
-
-i = spawn_gas(map, get_oxygen_position(map))
-print(f"It takes {i} turns to fill the ship with oxygen.")
\ No newline at end of file
+    '''The number of turns for gas spreading from origin to fill the ship.'''
+    return int(distance_field(map, [origin], OPEN_TILES).view().max())
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Map the ship and fill it with oxygen.")
+    parser.add_argument(
+        '--frontier', action='store_true',
+        help="Explore breadth first with forked droids instead of following walls.")
+    parser.add_argument('--processes', type=int, help="Probe the frontier in a process pool.")
+    parser.add_argument(
+        '--engine', choices=[INTERPRETER_ENGINE, COMPILED_ENGINE], default=INTERPRETER_ENGINE)
+    parser.add_argument(
+        '--checkpoint', help="Save the wall following droid to this file as it explores.")
+    parser.add_argument(
+        '--every', type=int, default=100000, help="Instructions run between checkpoints.")
+    parser.add_argument(
+        '--resume', action='store_true', help="Resume from the checkpoint if there is one.")
+    args = parser.parse_args()
+
+    if args.frontier or args.processes:
+        program = Program.from_file(open('./data/program.txt'))
+        map = explore_frontier(program, processes=args.processes, engine=args.engine)
+    elif args.checkpoint and args.resume and os.path.exists(args.checkpoint):
+        program, state = checkpoint.resume(args.checkpoint, args.every)
+        follower = WallFollower.from_state(state)
+        program.checkpointer.payload = follower.state  # type: ignore
+        map = explore(program, follower)
+    else:
+        program = Program.from_file(open('./data/program.txt'))
+        follower = WallFollower()
+        if args.checkpoint:
+            program.enable_checkpoints(args.checkpoint, args.every, payload=follower.state)
+        program.add_input(follower.direction)
+        map = explore(program, follower)
+    path = find_shortest_path(map, (0, 0))
+
+    # print(f"The shortest path to the oxygen is {len(path)} steps.")
+
+    i = spawn_gas(map, get_oxygen_position(map))
+    print(f"It takes {i} turns to fill the ship with oxygen.")
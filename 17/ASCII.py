@@ -1,13 +1,15 @@
 from intcode.intcode import Program, run_until_matches, run
-from intcode.util import draw_array
+from intcode.grid import lookup_table
+from intcode.render import TerminalRenderer
 import numpy as np
 
 from itertools import product
-from typing import List, Dict, Tuple, Iterable
+from typing import List, Dict, Tuple, Iterable, Optional
 Point = Tuple[int, int]
 
 
 CONVERSION_DICT = {i: chr(i) for i in range(256)}
+CONVERSION_ARRAY = lookup_table(CONVERSION_DICT)
 SCAFFOLD, EMPTY_SPACE, LINE_END = 35, 46, 10
 # This is localy what an intersection of scaffolds looks like.
 INTERSECTION_MASK = np.array([[46, 35, 46], [35, 35, 35], [46, 35, 46]])
@@ -35,44 +37,44 @@ def run_robot(
     program: Program, 
     main_routine: str, 
     functions: List[str],
-    camera_feed: bool=True) -> None:
+    camera_feed: bool=True,
+    max_fps: Optional[float]=None) -> None:
     # Force robot to wakeup
     program[0] = 2
     # Supply the main movement routine:
     run(program) 
-    program.input.extend(to_ascii(main_routine, reverse=True))
+    program.input.extend(to_ascii(main_routine))
     run(program) 
     for f in functions:
-        program.input.extend(to_ascii(f, reverse=True))
+        program.input.extend(to_ascii(f))
         run(program) 
     if camera_feed:
-        program.input.extend(to_ascii('y', reverse=True))
+        program.input.extend(to_ascii('y'))
     else:
-        program.input.extend(to_ascii('n', reverse=True))
+        program.input.extend(to_ascii('n'))
     program.reset_output()
     # I'm getting a spurious newline at this point, so clear it out.
     run_until_matches(program, outseq=to_ascii(''))
     program.reset_output()
     
+    # Only the cells changed since the previous camera frame are redrawn.
+    renderer = TerminalRenderer(max_fps=max_fps)
     halt = False
     while not halt:
         _, halt = run_until_matches(program, outseq=to_ascii('\n'))
-        console = to_square(program.output)
-        draw_array(console, conversion_table=CONVERSION_DICT); print()
+        if renderer.due(force=halt):
+            renderer.draw(CONVERSION_ARRAY[to_square(list(program.output))], force=True)
         program.reset_output()
 
 
-def to_ascii(code: str, reverse: bool=False) -> List[int]:
-    if reverse:
-        return ([ord(ch) for ch in code] + [LINE_END])[::-1]
-    else:
-        return [ord(ch) for ch in code] + [LINE_END]
+def to_ascii(code: str) -> List[int]:
+    return [ord(ch) for ch in code] + [LINE_END]
 
 
 program = Program.from_file(open('./data/ascii.txt', 'r'))
 
 #run(program)
-#console_out = to_square(program.output)
+#console_out = to_square(list(program.output))
 #draw_array(console_out, conversion_table=CONVERSION_DICT)
 # total_alignment_parameter = sum(x * y for x, y in iter_intersections(console_out))
 # print(f"The total allignment parameter is {total_alignment_parameter}")
@@ -1,14 +1,18 @@
-from typing import Iterable, Tuple, List, Set, Dict
+from bisect import bisect_left, bisect_right, insort
+from collections import defaultdict
+from itertools import chain
+from typing import (
+    Iterable, Iterator, Tuple, List, Set, Dict, NamedTuple, Optional, Sequence, Union)
 
 Instruction = Tuple[str, int]
 Point = Tuple[int, int]
 
-def create_path(program: str, start: Point = (0, 0)) -> List[Point]:
-    p = compile(program)
-    path = [start]
-    for instruction in p:
-        path.extend(process_instruction(instruction, start=path[-1]))
-    return path[1:]
+ORIGIN = (0, 0)
+DIRECTIONS = {'R': (1, 0), 'L': (-1, 0), 'U': (0, 1), 'D': (0, -1)}
+# Segments spanning more buckets than this are kept out of the buckets of a
+# WireIndex, and checked against every segment instead.
+MAX_SEGMENT_BUCKETS = 16
+
 
 def compile(program: str) -> Iterable[Instruction]:
     instructions = program.split(',')
@@ -17,44 +21,323 @@ def compile(program: str) -> Iterable[Instruction]:
 
 def process_instruction(instruction: Instruction, start: Point) -> List[Point]:
     opcode, value = instruction
-    if opcode == 'R':
-        return [(start[0] + i + 1, start[1]) for i in range(value)]
-    elif opcode == 'L':
-        return [(start[0] - i - 1, start[1]) for i in range(value)]
-    elif opcode == 'U':
-        return [(start[0], start[1] + i + 1) for i in range(value)]
-    elif opcode == 'D':
-        return [(start[0], start[1] - i - 1) for i in range(value)]
-    else:
+    if opcode not in DIRECTIONS:
         raise ValueError(f"Opcode {opcode} unknown.")
-    
+    dx, dy = DIRECTIONS[opcode]
+    return [(start[0] + dx * (i + 1), start[1] + dy * (i + 1)) for i in range(value)]
+
+
+class Segment(NamedTuple):
+    '''A straight run of wire from (x0, y0) to (x1, y1), reached after steps.'''
+    x0: int
+    y0: int
+    x1: int
+    y1: int
+    steps: int
+
+    @property
+    def horizontal(self) -> bool:
+        return self.y0 == self.y1
+
+    def steps_to(self, point: Point) -> int:
+        return self.steps + abs(point[0] - self.x0) + abs(point[1] - self.y0)
+
+
+class Wire:
+
+    def __init__(self, program: str, start: Point = ORIGIN) -> None:
+        self.segments = list(create_segments(program, start))
+        self.horizontal = [s for s in self.segments if s.horizontal]
+        self.vertical = [s for s in self.segments if not s.horizontal]
+        self.length = sum(abs(s.x1 - s.x0) + abs(s.y1 - s.y0) for s in self.segments)
+
+
+def create_segments(program: str, start: Point = ORIGIN) -> Iterator[Segment]:
+    x, y = start
+    steps = 0
+    for opcode, value in compile(program):
+        if opcode not in DIRECTIONS:
+            raise ValueError(f"Opcode {opcode} unknown.")
+        dx, dy = DIRECTIONS[opcode]
+        # Moves of length zero cover no new points.
+        if value:
+            yield Segment(x, y, x + dx * value, y + dy * value, steps)
+        x, y, steps = x + dx * value, y + dy * value, steps + value
+
+
+class Crossing(NamedTuple):
+    '''Where a segment of one wire meets a segment of another.
+
+    Perpendicular segments meet at a single point, collinear ones may overlap
+    along a run of points, given by the inclusive box from (x0, y0) to
+    (x1, y1). The origin, where every wire starts, never counts.
+    '''
+    wire_a: int
+    segment_a: Segment
+    wire_b: int
+    segment_b: Segment
+    x0: int
+    y0: int
+    x1: int
+    y1: int
+
+    def points(self) -> Iterator[Point]:
+        for x in range(self.x0, self.x1 + 1):
+            for y in range(self.y0, self.y1 + 1):
+                if (x, y) != ORIGIN:
+                    yield (x, y)
+
+    def candidates(self) -> List[Point]:
+        '''The points minimizing either distance over the crossing.
+
+        Both Manhattan distance and the steps along each wire are convex
+        along a straight run, so the minimum lies at an end, at the point
+        nearest the origin, or beside the origin if that is excluded.
+        '''
+        points = [(self.x0, self.y0), (self.x1, self.y1), self.clamp(ORIGIN)]
+        points.extend(self.clamp((dx, dy)) for dx, dy in DIRECTIONS.values())
+        return [p for p in points if p != ORIGIN]
+
+    def clamp(self, point: Point) -> Point:
+        return (min(max(point[0], self.x0), self.x1), min(max(point[1], self.y0), self.y1))
+
+    def min_manhattan_norm(self) -> Optional[int]:
+        return min((manhattan_norm(p) for p in self.candidates()), default=None)
+
+    def min_wire_distance(self) -> Optional[int]:
+        return min((
+            self.segment_a.steps_to(p) + self.segment_b.steps_to(p)
+            for p in self.candidates()), default=None)
+
+
+def find_crossings(wires: Sequence[Wire]) -> List[Crossing]:
+    '''Every crossing between segments of different wires.'''
+    return perpendicular_crossings(wires) + collinear_crossings(wires)
+
+# Sweep events, ordered so that segments touching at a point still meet.
+START, QUERY, END = 0, 1, 2
+
+def perpendicular_crossings(wires: Sequence[Wire]) -> List[Crossing]:
+    '''Sweep a vertical line across the plane, keeping the horizontal
+    segments it cuts sorted by y, and look up each vertical segment's span
+    among them.'''
+    events: List[Tuple[int, int, int, int, Segment]] = []
+    for w, wire in enumerate(wires):
+        for i, s in enumerate(wire.horizontal):
+            events.append((min(s.x0, s.x1), START, w, i, s))
+            events.append((max(s.x0, s.x1), END, w, i, s))
+        for i, s in enumerate(wire.vertical):
+            events.append((s.x0, QUERY, w, i, s))
+    events.sort(key=lambda event: event[:4])
+    # Horizontal segments cut by the sweep line, as (y, wire, index, segment).
+    active: List[Tuple[int, int, int, Segment]] = []
+    crossings = []
+    for x, kind, w, i, s in events:
+        if kind == START:
+            insort(active, (s.y0, w, i, s))
+        elif kind == END:
+            del active[bisect_left(active, (s.y0, w, i))]
+        else:
+            lo = bisect_left(active, (min(s.y0, s.y1),))
+            hi = bisect_right(active, (max(s.y0, s.y1), len(wires)))
+            for y, other, _, h in active[lo:hi]:
+                if other != w and (x, y) != ORIGIN:
+                    crossings.append(ordered_crossing(w, s, other, h, x, y, x, y))
+    return crossings
+
+def collinear_crossings(wires: Sequence[Wire]) -> List[Crossing]:
+    '''Overlaps between segments of different wires lying on the same line.'''
+    lines: Dict[Tuple[bool, int], List[Tuple[int, int, int, Segment]]] = defaultdict(list)
+    for w, wire in enumerate(wires):
+        for s in wire.segments:
+            if s.horizontal:
+                lines[(True, s.y0)].append((min(s.x0, s.x1), max(s.x0, s.x1), w, s))
+            else:
+                lines[(False, s.x0)].append((min(s.y0, s.y1), max(s.y0, s.y1), w, s))
+    crossings = []
+    for (horizontal, c), intervals in lines.items():
+        intervals.sort(key=lambda interval: interval[0])
+        open_intervals: List[Tuple[int, int, int, Segment]] = []
+        for lo, hi, w, s in intervals:
+            open_intervals = [interval for interval in open_intervals if interval[1] >= lo]
+            for _, other_hi, other, t in open_intervals:
+                if other == w:
+                    continue
+                end = min(hi, other_hi)
+                if horizontal:
+                    crossing = ordered_crossing(w, s, other, t, lo, c, end, c)
+                else:
+                    crossing = ordered_crossing(w, s, other, t, c, lo, c, end)
+                if (crossing.x0, crossing.y0, crossing.x1, crossing.y1) != ORIGIN * 2:
+                    crossings.append(crossing)
+            open_intervals.append((lo, hi, w, s))
+    return crossings
+
+def ordered_crossing(
+    w: int, s: Segment, other: int, t: Segment, x0: int, y0: int, x1: int, y1: int) -> Crossing:
+    if w < other:
+        return Crossing(w, s, other, t, x0, y0, x1, y1)
+    return Crossing(other, t, w, s, x0, y0, x1, y1)
+
+def segment_crossing(w: int, s: Segment, other: int, t: Segment) -> Optional[Crossing]:
+    '''Where two segments of different wires meet, if they do.'''
+    s_x0, s_x1 = sorted((s.x0, s.x1))
+    s_y0, s_y1 = sorted((s.y0, s.y1))
+    t_x0, t_x1 = sorted((t.x0, t.x1))
+    t_y0, t_y1 = sorted((t.y0, t.y1))
+    x0, x1 = max(s_x0, t_x0), min(s_x1, t_x1)
+    y0, y1 = max(s_y0, t_y0), min(s_y1, t_y1)
+    # The intersection of the two boxes is either empty, a point, or a run of
+    # a collinear overlap.
+    if x0 > x1 or y0 > y1 or (x0, y0, x1, y1) == ORIGIN * 2:
+        return None
+    return ordered_crossing(w, s, other, t, x0, y0, x1, y1)
+
+
+class WireIndex:
+    '''A spatial index of wires, for queries between many pairs of them.
+
+    Segments are filed into square buckets of side bucket_size, by default
+    the median segment length of the first wire added, so each segment lands
+    in only a few buckets. Each wire added is only checked against segments
+    sharing its buckets, and the crossings found are cached for every pair of
+    wires, as are the answers to queries about them.
+
+    Segments much longer than the buckets, which would be filed into a bucket
+    per bucket_size of their length, are kept in a separate list instead.
+    They are checked against every segment of the other wires, so the work
+    grows with the number of segments rather than their lengths.
+    '''
+
+    def __init__(self, bucket_size: Optional[int] = None) -> None:
+        self.bucket_size = bucket_size
+        self.wires: List[Wire] = []
+        self.buckets: Dict[Point, List[Tuple[int, Segment]]] = defaultdict(list)
+        self.long_segments: List[Tuple[int, Segment]] = []
+        self.crossings: Dict[Tuple[int, int], List[Crossing]] = {}
+        self.nearest: Dict[Tuple[int, int], Optional[int]] = {}
+        self.delays: Dict[Tuple[int, int], Optional[int]] = {}
+
+    def add(self, wire: Union[str, Wire]) -> int:
+        '''Index a wire, finding its crossings with every wire already
+        indexed, and return its id.'''
+        if isinstance(wire, str):
+            wire = Wire(wire)
+        w = len(self.wires)
+        if self.bucket_size is None:
+            lengths = sorted(abs(s.x1 - s.x0) + abs(s.y1 - s.y0) for s in wire.segments)
+            self.bucket_size = max(lengths[len(lengths) // 2], 1) if lengths else 1
+        for other in range(w):
+            self.crossings[(other, w)] = []
+        found: Set[Tuple[int, Segment, Segment]] = set()
+        for s in wire.segments:
+            candidates: Iterable[Tuple[int, Segment]]
+            if self.is_long(s):
+                candidates = (
+                    (other, t) for other, indexed in enumerate(self.wires)
+                    for t in indexed.segments)
+            else:
+                candidates = chain(
+                    chain.from_iterable(self.buckets[b] for b in self.segment_buckets(s)),
+                    self.long_segments)
+            for other, t in candidates:
+                if (other, t, s) in found:
+                    continue
+                found.add((other, t, s))
+                crossing = segment_crossing(other, t, w, s)
+                if crossing:
+                    self.crossings[(other, w)].append(crossing)
+        for s in wire.segments:
+            if self.is_long(s):
+                self.long_segments.append((w, s))
+            else:
+                for bucket in self.segment_buckets(s):
+                    self.buckets[bucket].append((w, s))
+        self.wires.append(wire)
+        return w
+
+    def is_long(self, s: Segment) -> bool:
+        assert self.bucket_size
+        size = self.bucket_size
+        width = max(s.x0, s.x1) // size - min(s.x0, s.x1) // size + 1
+        height = max(s.y0, s.y1) // size - min(s.y0, s.y1) // size + 1
+        return width * height > MAX_SEGMENT_BUCKETS
+
+    def segment_buckets(self, s: Segment) -> Iterator[Point]:
+        assert self.bucket_size
+        size = self.bucket_size
+        for bx in range(min(s.x0, s.x1) // size, max(s.x0, s.x1) // size + 1):
+            for by in range(min(s.y0, s.y1) // size, max(s.y0, s.y1) // size + 1):
+                yield (bx, by)
+
+    def pairs(self) -> List[Tuple[int, int]]:
+        return list(self.crossings)
+
+    def pair_crossings(self, a: int, b: int) -> List[Crossing]:
+        return self.crossings[(min(a, b), max(a, b))]
+
+    def intersection_points(self, a: int, b: int) -> Set[Point]:
+        return {p for c in self.pair_crossings(a, b) for p in c.points()}
+
+    def nearest_crossing(self, a: int, b: int) -> Optional[int]:
+        '''The Manhattan distance to the crossing of two wires nearest the origin.'''
+        pair = (min(a, b), max(a, b))
+        if pair not in self.nearest:
+            self.nearest[pair] = min((
+                d for d in (c.min_manhattan_norm() for c in self.crossings[pair])
+                if d is not None), default=None)
+        return self.nearest[pair]
+
+    def min_signal_delay(self, a: int, b: int) -> Optional[int]:
+        '''The fewest combined steps along two wires to where they cross.'''
+        pair = (min(a, b), max(a, b))
+        if pair not in self.delays:
+            self.delays[pair] = min((
+                d for d in (c.min_wire_distance() for c in self.crossings[pair])
+                if d is not None), default=None)
+        return self.delays[pair]
+
+    def all_nearest_crossings(self) -> Dict[Tuple[int, int], Optional[int]]:
+        return {pair: self.nearest_crossing(*pair) for pair in self.crossings}
+
+    def all_min_signal_delays(self) -> Dict[Tuple[int, int], Optional[int]]:
+        return {pair: self.min_signal_delay(*pair) for pair in self.crossings}
+
+
 def get_intersection_points(program_1: str, program_2: str) -> Set[Point]:
-    path_1, path_2 = create_path(program_1), create_path(program_2)
-    return set(path_1) & set(path_2)
+    return {p for c in find_crossings([Wire(program_1), Wire(program_2)]) for p in c.points()}
 
 def wire_distance_to_intersection_points(
     program_1: str, program_2: str) -> Tuple[Dict[Point, int], Dict[Point, int]]:
-    path_1, path_2 = create_path(program_1), create_path(program_2)
-    intersections = set(path_1) & set(path_2)
-    distance_lookup_1 = {point: n for n, point in enumerate(path_1, start=1)
-                                   if point in intersections}
-    distance_lookup_2 = {point: n for n, point in enumerate(path_2, start=1)
-                                   if point in intersections}
+    '''The fewest steps along each wire to each point where they cross.'''
+    distance_lookup_1: Dict[Point, int] = {}
+    distance_lookup_2: Dict[Point, int] = {}
+    for crossing in find_crossings([Wire(program_1), Wire(program_2)]):
+        for point in crossing.points():
+            distance_lookup_1[point] = min(
+                distance_lookup_1.get(point, crossing.segment_a.steps_to(point)),
+                crossing.segment_a.steps_to(point))
+            distance_lookup_2[point] = min(
+                distance_lookup_2.get(point, crossing.segment_b.steps_to(point)),
+                crossing.segment_b.steps_to(point))
     return distance_lookup_1, distance_lookup_2
 
 def manhattan_norm(t: Point) -> int:
     return abs(t[0]) + abs(t[1])
 
-def min_manhattan_norm(program_1: str, program_2: str) -> int:
-    return min(manhattan_norm(t) for t in get_intersection_points(program_1, program_2)) 
+def min_manhattan_norm(*programs: str) -> int:
+    '''The crossing of any two wires nearest the origin.'''
+    return min(
+        distance for distance in (
+            c.min_manhattan_norm() for c in find_crossings([Wire(p) for p in programs]))
+        if distance is not None)
 
-def min_wire_distance(program_1: str, program_2: str) -> int:
-    distance_lookup_1, distance_lookup_2 = wire_distance_to_intersection_points(
-        program_1, program_2)
-    distance_lookup = {
-        point: distance_lookup_1[point] + distance_lookup_2[point]
-        for point in distance_lookup_1}
-    return min(distance_lookup.values())
+def min_wire_distance(*programs: str) -> int:
+    '''The fewest combined steps along two wires to where they cross.'''
+    return min(
+        distance for distance in (
+            c.min_wire_distance() for c in find_crossings([Wire(p) for p in programs]))
+        if distance is not None)
 
 
 assert list(compile("R75,D30,R83,U83")) == [("R", 75), ("D", 30), ("R", 83), ("U", 83)]
@@ -68,11 +351,13 @@ assert min_manhattan_norm("R75,D30,R83,U83,L12,D49,R71,U7,L72",
 assert min_manhattan_norm("R98,U47,R26,D63,R33,U87,L62,D20,R33,U53,R51",
                           "U98,R91,D20,R16,D67,R40,U7,R15,U6,R7") == 135
 
-with open('./data/program.txt', 'r') as f:
-    program_1, program_2 = f.readline(), f.readline()
+if __name__ == '__main__':
+    index = WireIndex()
+    with open('./data/program.txt', 'r') as f:
+        wire_1, wire_2 = index.add(f.readline()), index.add(f.readline())
 
-distance = min_manhattan_norm(program_1, program_2)
-print(f"The minimum manhattan distance to an intersection is {distance}.")
+    distance = index.nearest_crossing(wire_1, wire_2)
+    print(f"The minimum manhattan distance to an intersection is {distance}.")
 
-distance = min_wire_distance(program_1, program_2)
-print(f"The minimum wire distance to an intersection is {distance}.")
\ No newline at end of file
+    distance = index.min_signal_delay(wire_1, wire_2)
+    print(f"The minimum wire distance to an intersection is {distance}.")
\ No newline at end of file
@@ -1,3 +1,8 @@
+from collections import Counter
+from itertools import combinations_with_replacement, groupby
+from typing import Callable, Iterator, Optional, Sequence, Tuple, Union
+import numpy as np
+
 def has_two_adjacent_digits_same(n: int) -> bool:
     digit, n = n % 10, n // 10
     while n > 0:
@@ -33,6 +38,153 @@ def run_length_exactly_two(n: int) -> bool:
     return False
 
 
+# Counting passwords.
+#
+# A valid password's digits never decrease, so it has no zeros, and it is one
+# of the few non-decreasing digit strings. Counts are found with a dynamic
+# program over the digits of the bound, tracking the last digit, the length
+# of the current run of equal digits, whether the run rule is met yet, and
+# whether the digits so far equal the bound's. The rule is either a run of at
+# least two equal digits, or, given a run_length, a run of exactly that many.
+
+# Last digit, current run length (capped), rule satisfied, still tight.
+State = Tuple[int, int, bool, bool]
+
+
+def count_up_to(n: int, run_length: Optional[int] = None) -> int:
+    '''The number of valid passwords in [1, n].'''
+    if n <= 0:
+        return 0
+    n_digits = len(str(n))
+    return (sum(count_digits('9' * length, run_length) for length in range(1, n_digits))
+            + count_digits(str(n), run_length))
+
+def count_passwords(lo: int, hi: int, run_length: Optional[int] = None) -> int:
+    '''The number of valid passwords in [lo, hi].'''
+    return count_up_to(hi, run_length) - count_up_to(lo - 1, run_length)
+
+def count_length(n_digits: int, run_length: Optional[int] = None) -> int:
+    '''The number of valid passwords with exactly n_digits digits.'''
+    return count_digits('9' * n_digits, run_length)
+
+def count_digits(bound: str, run_length: Optional[int]) -> int:
+    '''Valid passwords with as many digits as bound, and at most bound.'''
+    cap = (run_length or 1) + 1
+    limits = [int(digit) for digit in bound]
+    states: Counter = Counter(
+        (digit, 1, False, digit == limits[0])
+        for digit in range(1, limits[0] + 1))
+    for limit in limits[1:]:
+        next_states: Counter = Counter()
+        for (last, run, satisfied, tight), count in states.items():
+            for digit in range(last, (limit if tight else 9) + 1):
+                if digit == last:
+                    next_run, next_satisfied = min(run + 1, cap), satisfied
+                else:
+                    next_run, next_satisfied = 1, satisfied or run == run_length
+                if run_length is None and next_run >= 2:
+                    next_satisfied = True
+                next_states[(digit, next_run, next_satisfied, tight and digit == limit)] += count
+        states = next_states
+    return sum(
+        count for (_, run, satisfied, _), count in states.items()
+        if satisfied or run == run_length)
+
+def iter_passwords(lo: int, hi: int, run_length: Optional[int] = None) -> Iterator[int]:
+    '''Stream the valid passwords in [lo, hi] in increasing order.'''
+    for n_digits in range(len(str(max(lo, 1))), len(str(hi)) + 1):
+        # Non-decreasing digit strings come out in increasing order.
+        for digits in combinations_with_replacement(range(1, 10), n_digits):
+            n = int(''.join(map(str, digits)))
+            if n > hi:
+                return
+            if n >= lo and satisfies_run_rule(digits, run_length):
+                yield n
+
+def satisfies_run_rule(digits: Tuple[int, ...], run_length: Optional[int] = None) -> bool:
+    run_lengths = [len(list(run)) for _, run in groupby(digits)]
+    if run_length is None:
+        return max(run_lengths) >= 2
+    return run_length in run_lengths
+
+
+# Vectorized rules.
+#
+# Candidates are checked a chunk at a time, each chunk decomposed into an
+# (N, d) matrix of digits, most significant first, with rules evaluated as
+# array operations over it. Numbers shorter than d are padded on the left
+# with distinct, increasing negative values, which never equal a digit or one
+# another, so padding never forms a run or breaks an increasing sequence.
+# Candidates must fit in an int64.
+
+Rule = Callable[[np.ndarray], np.ndarray]
+Candidates = Union[range, np.ndarray, Sequence[int]]
+
+DEFAULT_CHUNK_SIZE = 1 << 16
+
+
+def digit_matrix(candidates: np.ndarray) -> np.ndarray:
+    candidates = np.asarray(candidates, dtype=np.int64)
+    n_digits = len(str(int(candidates.max()))) if candidates.size else 1
+    powers = 10 ** np.arange(n_digits - 1, -1, -1, dtype=np.int64)
+    digits = (candidates[:, None] // powers) % 10
+    padding = candidates[:, None] < powers
+    padding[:, -1] = False  # Zero itself has a digit.
+    return np.where(padding, np.arange(-n_digits, 0), digits)
+
+def increasing_digits(digits: np.ndarray) -> np.ndarray:
+    return np.all(digits[:, 1:] >= digits[:, :-1], axis=1)
+
+def adjacent_pair(digits: np.ndarray) -> np.ndarray:
+    return np.any(digits[:, 1:] == digits[:, :-1], axis=1)
+
+def run_length_exactly(run_length: int) -> Rule:
+    '''A rule for a run of exactly run_length equal digits.'''
+    def rule(digits: np.ndarray) -> np.ndarray:
+        n, d = digits.shape
+        # Run length encode every row at once. Each row starts a run, so runs
+        # in the flattened matrix never cross rows.
+        run_starts = np.ones((n, d), dtype=bool)
+        run_starts[:, 1:] = digits[:, 1:] != digits[:, :-1]
+        starts = np.flatnonzero(run_starts)
+        lengths = np.diff(np.append(starts, n * d))
+        matching = starts[(lengths == run_length) & (digits.ravel()[starts] >= 0)]
+        result = np.zeros(n, dtype=bool)
+        result[matching // d] = True
+        return result
+    return rule
+
+run_length_two = run_length_exactly(2)
+
+def iter_chunks(candidates: Candidates, chunk_size: int) -> Iterator[np.ndarray]:
+    if isinstance(candidates, range) and candidates.step == 1:
+        for start in range(candidates.start, candidates.stop, chunk_size):
+            yield np.arange(start, min(start + chunk_size, candidates.stop), dtype=np.int64)
+    else:
+        for start in range(0, len(candidates), chunk_size):
+            yield np.asarray(candidates[start : start + chunk_size], dtype=np.int64)
+
+def filter_candidates(
+    candidates: Candidates,
+    rules: Sequence[Rule],
+    chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[np.ndarray]:
+    '''Stream the candidates passing every rule, a chunk at a time.'''
+    for chunk in iter_chunks(candidates, chunk_size):
+        if not chunk.size:
+            continue
+        digits = digit_matrix(chunk)
+        passing = np.ones(len(chunk), dtype=bool)
+        for rule in rules:
+            passing &= rule(digits)
+        yield chunk[passing]
+
+def count_matching(
+    candidates: Candidates,
+    rules: Sequence[Rule],
+    chunk_size: int = DEFAULT_CHUNK_SIZE) -> int:
+    return sum(len(chunk) for chunk in filter_candidates(candidates, rules, chunk_size))
+
+
 assert has_two_adjacent_digits_same(12345) == False
 assert has_two_adjacent_digits_same(2) == False
 assert has_two_adjacent_digits_same(1123) == True
@@ -51,14 +203,15 @@ assert run_length_exactly_two(111122) == True
 assert run_length_exactly_two(111122223334455566666) == True
 assert run_length_exactly_two(111122233345666) == False
 
-n_good_passwords = sum(
-    has_two_adjacent_digits_same(n) and increasing(n)
-    for n in range(246540, 787419 + 1)
-)
-print(f"The number of good passwords in the range is: {n_good_passwords}")
-
-n_very_good_passwords = sum(
-    increasing(n) and run_length_exactly_two(n)
-    for n in range(246540, 787419 + 1)
-)
-print(f"The number of very good passwords in the range is: {n_very_good_passwords}")
\ No newline at end of file
+assert count_passwords(111111, 111111) == 1
+assert count_passwords(123444, 123444, run_length=2) == 0
+assert count_passwords(111122, 111122, run_length=2) == 1
+assert count_matching(range(246540, 256540), [increasing_digits, adjacent_pair]) == count_passwords(246540, 256539)
+assert count_matching([111122, 123444, 112233, 12], [increasing_digits, run_length_two]) == 2
+
+if __name__ == '__main__':
+    n_good_passwords = count_passwords(246540, 787419)
+    print(f"The number of good passwords in the range is: {n_good_passwords}")
+
+    n_very_good_passwords = count_passwords(246540, 787419, run_length=2)
+    print(f"The number of very good passwords in the range is: {n_very_good_passwords}")
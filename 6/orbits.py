@@ -1,107 +1,155 @@
-from typing import Optional, List, Dict, Set, Iterator, IO
-
-
-class Orbit:
-
-    def __init__(
-        self, planet: str, children: Optional[List['Orbit']] = None) -> None:
-        self.planet = planet
-        self.children: List['Orbit'] = children if children else []
-        self.parents: List['Orbit'] = []
-    
-    def append(self, orbit: 'Orbit') -> None:
-        orbit.parents.append(self)
-        self.children.append(orbit)
-    
-    def __iter__(self) -> Iterator['Orbit']:
-        yield from self.children
-    
-    def __hash__(self) -> int:
-        return hash(self.planet)
-    
-    def __repr__(self) -> str:
-        return f"Orbit{self.planet}"
-    
-    def count_descendents(self, already_counted: Optional[Set[str]] = None) -> int:
-        if not already_counted:
-            already_counted = set()
-        already_counted.add(self.planet)
-        if self.children == []:
-            return 0
-        else:
-            return (
-                len([o for o in self.children if o.planet not in already_counted]) 
-                + sum(
-                    o.count_descendents(
-                        already_counted=already_counted) for o in self.children))
-    
-    def find_minimum_transfter_path(
-        self, target: 'Orbit', all_orbits: Set['Orbit']) -> List['Orbit']:
-        # Dijkstra's algorithm.
-        all_orbits = all_orbits.copy() 
-        distances: Dict['Orbit', int] = {o: 10**10 for o in all_orbits}
-        previous: Dict['Orbit', 'Orbit'] = {}
-        distances[self] = 0
-        while all_orbits:
-            min_distance_orbit = min(
-                {o: dist for o, dist in distances.items() if o in all_orbits},
-                 key=distances.get)
-            all_orbits.remove(min_distance_orbit)
-            if min_distance_orbit == target:
-                break
-            for nbr in min_distance_orbit.parents + min_distance_orbit.children:
-                alt_distance = distances[min_distance_orbit] + 1
-                if alt_distance < distances[nbr]:
-                    distances[nbr] = alt_distance
-                    previous[nbr] = min_distance_orbit
-        # Now walk backwards from the target to find the path.        
-        path: List['Orbit'] = []
-        current = target
-        while current != self:
-            if previous[current]:
-                path.append(current)
-                current = previous[current]
-        path.append(self)
-        return path
-
-
-
-
-
-        # print(current_path)
-        # if not current_path:
-        #     current_path = []
-        # if self == target:
-        #     return current_path + [target]
-        # else:
-        #     return o.find_minimum_transfter_path(target=target, current_path=current_path + [self])
-        #                for o in self.children + self.parents if o not in current_path
-
-
-def from_file(f: IO) -> Dict[str, Orbit]:
-    planets: Dict[str, Orbit] = {}
-    for line in f:
-        parent, child = line.strip().split(")")
-        if child not in planets:
-           orbit_child = Orbit(planet=child)
-           planets[child] = orbit_child
-        else:
-           orbit_child = planets[child]
-        if parent not in planets: 
-            orbit_parent = Orbit(planet=parent)
-            planets[parent] = orbit_parent
-        else:
-           orbit_parent = planets[parent]
-        orbit_parent.append(orbit_child)
-    return planets
-
-orbits = from_file(open('./data/input.txt', 'r'))
-# parentless_orbits = [o for o in orbits.values() if not o.parents]
-# print(f"Parentless orbits:\n    {parentless_orbits}")
-s = sum(o.count_descendents() for o in orbits.values())
-print(f"The total number of orbital relations is {s}")
-
-you, santa = orbits['YOU'], orbits['SAN']
-path = you.find_minimum_transfter_path(santa, all_orbits=set(orbits.values()))
-# Watch out for fencepost errors.
-print(f"The length of the minimal transfer path is {len(path) - 3}")
\ No newline at end of file
+from array import array
+from typing import Dict, IO, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+
+
+class OrbitMap:
+    '''The orbits as a forest of bodies, each orbiting at most one parent.
+
+    Bodies are interned to integer ids in the order they are first seen, and
+    the tree is held in arrays: each body's parent, and its children in
+    compressed sparse row form. A single pass over the children gives a
+    traversal order with every body after its parent, from which depths and
+    orbit counts follow without recursion, however long the chains. A binary
+    lifting table of ancestors, built on the first query, answers lowest
+    common ancestor and so transfer distance queries in O(log V), for whole
+    arrays of pairs at once.
+    '''
+
+    ROOT = -1
+
+    def __init__(self, orbits: Iterable[Tuple[str, str]]) -> None:
+        self.index: Dict[str, int] = {}
+        # Orbits are streamed into compact arrays as they are read, each new
+        # name taking the next id.
+        index, parent_ids, child_ids = self.index, array('i'), array('i')
+        for parent, child in orbits:
+            parent_ids.append(index.setdefault(parent, len(index)))
+            child_ids.append(index.setdefault(child, len(index)))
+        self.names: List[str] = list(index)
+        n_bodies = len(self.names)
+        parents = np.frombuffer(parent_ids, dtype=np.intc).astype(np.int32)
+        children = np.frombuffer(child_ids, dtype=np.intc).astype(np.int32)
+        n_parents = np.bincount(children, minlength=n_bodies)
+        if n_parents.size and n_parents.max() > 1:
+            child = self.names[int(n_parents.argmax())]
+            raise ValueError(f"{child} orbits more than one body.")
+        self.parent = np.full(n_bodies, self.ROOT, dtype=np.int32)
+        self.parent[children] = parents
+        self.children = children[np.argsort(parents, kind='stable')]
+        self.child_offsets = np.zeros(n_bodies + 1, dtype=np.int32)
+        np.cumsum(np.bincount(parents, minlength=n_bodies), out=self.child_offsets[1:])
+        self.order = self.traversal_order()
+        if self.order.size != n_bodies:
+            raise ValueError("The orbits contain a cycle.")
+        self.depth = self.depths()
+        self._ancestors: Optional[np.ndarray] = None
+
+    @classmethod
+    def from_file(cls, f: IO) -> 'OrbitMap':
+        '''Stream orbits from a file, one PARENT)CHILD per line.'''
+        return cls(line.strip().split(')', 1) for line in f if line.strip())  # type: ignore
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    @property
+    def nbytes(self) -> int:
+        '''Memory held by the tree's arrays, excluding the names.'''
+        arrays = [self.parent, self.children, self.child_offsets, self.order, self.depth]
+        if self._ancestors is not None:
+            arrays.append(self._ancestors)
+        return sum(a.nbytes for a in arrays)
+
+    def traversal_order(self) -> np.ndarray:
+        '''Every body reachable from a root, each after its parent.'''
+        children, offsets = self.children.tolist(), self.child_offsets.tolist()
+        order = np.flatnonzero(self.parent == self.ROOT).tolist()
+        # The order doubles as the queue of bodies whose children are next.
+        i = 0
+        while i < len(order):
+            body = order[i]
+            order.extend(children[offsets[body] : offsets[body + 1]])
+            i += 1
+        return np.array(order, dtype=np.int32)
+
+    def depths(self) -> np.ndarray:
+        parent, depth = self.parent.tolist(), [0] * len(self.names)
+        for body in self.order.tolist():
+            if parent[body] != self.ROOT:
+                depth[body] = depth[parent[body]] + 1
+        return np.array(depth, dtype=np.int32)
+
+    def descendant_counts(self) -> np.ndarray:
+        '''The number of bodies directly or indirectly orbiting each body,
+        accumulated from the last body in the order back.'''
+        parent, counts = self.parent.tolist(), [0] * len(self.names)
+        for body in reversed(self.order.tolist()):
+            if parent[body] != self.ROOT:
+                counts[parent[body]] += counts[body] + 1
+        return np.array(counts, dtype=np.int64)
+
+    def total_orbits(self) -> int:
+        # Every body is orbited once for each body it directly or indirectly
+        # orbits, so this is the sum of descendant counts.
+        return int(self.depth.sum(dtype=np.int64))
+
+    @property
+    def ancestors(self) -> np.ndarray:
+        '''ancestors[k, body] is the 2**k-th ancestor of body, or ROOT.'''
+        if self._ancestors is None:
+            n_levels = max(int(self.depth.max(initial=0)).bit_length(), 1)
+            ancestors = np.empty((n_levels, len(self.names)), dtype=np.int32)
+            ancestors[0] = self.parent
+            for k in range(1, n_levels):
+                previous = ancestors[k - 1]
+                ancestors[k] = np.where(previous != self.ROOT, previous[previous], self.ROOT)
+            self._ancestors = ancestors
+        return self._ancestors
+
+    def ids(self, names: Sequence[str]) -> np.ndarray:
+        return np.fromiter((self.index[name] for name in names), dtype=np.int64, count=len(names))
+
+    def common_ancestors(self, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+        '''The lowest common ancestor of each pair of bodies a[i], b[i].'''
+        ancestors = self.ancestors
+        a, b = original_a, original_b = np.asarray(a), np.asarray(b)
+        deeper = self.depth[a] < self.depth[b]
+        a, b = np.where(deeper, b, a), np.where(deeper, a, b)
+        # Lift a to the depth of b.
+        height = self.depth[a] - self.depth[b]
+        for k in range(len(ancestors)):
+            a = np.where((height >> k) & 1, ancestors[k][a], a)
+        # Lift both to just below their lowest common ancestor.
+        for k in reversed(range(len(ancestors))):
+            lifted_a, lifted_b = ancestors[k][a], ancestors[k][b]
+            differ = lifted_a != lifted_b
+            a, b = np.where(differ, lifted_a, a), np.where(differ, lifted_b, b)
+        common = np.where(a == b, a, self.parent[a])
+        if (common == self.ROOT).any():
+            i = int(np.flatnonzero(common == self.ROOT)[0])
+            raise ValueError(
+                f"{self.names[original_a[i]]} and {self.names[original_b[i]]} share no ancestor.")
+        return common
+
+    def distances(self, pairs: Sequence[Tuple[str, str]]) -> np.ndarray:
+        '''The number of orbit steps between each pair of bodies.'''
+        a, b = self.ids([a for a, _ in pairs]), self.ids([b for _, b in pairs])
+        common = self.common_ancestors(a, b)
+        return self.depth[a] + self.depth[b] - 2 * self.depth[common]
+
+    def lowest_common_ancestor(self, a: str, b: str) -> str:
+        return self.names[int(self.common_ancestors(self.ids([a]), self.ids([b]))[0])]
+
+    def distance(self, a: str, b: str) -> int:
+        return int(self.distances([(a, b)])[0])
+
+    def transfers(self, a: str, b: str) -> int:
+        '''Orbital transfers to move from the body a orbits to the body b orbits.'''
+        return self.distance(a, b) - 2
+
+
+if __name__ == '__main__':
+    orbits = OrbitMap.from_file(open('./data/input.txt', 'r'))
+    print(f"The total number of orbital relations is {orbits.total_orbits()}")
+    print(f"The length of the minimal transfer path is {orbits.transfers('YOU', 'SAN')}")
@@ -1,38 +1,40 @@
-from intcode.intcode import Program, run, run_until_output
+from intcode.intcode import Program, run
+from intcode.network import ring
 
 from typing import List
 from itertools import permutations
 
 
-def run_trusters(code: List[str], phases: List[int]) -> int:
+def run_trusters(base: Program, phases: List[int]) -> int:
     output = 0
     while phases:
         phase = phases.pop()
-        program = Program(code[:], input=[output, phase])
+        program = base.fork()
+        program.add_input(phase, output)
         run(program)
         output = program.output[0]
     return output
 
 def max_thrust(code: List[int]) -> int:
+    base = Program(code)
     return max(
-        run_trusters(code[:], list(phases)) 
+        run_trusters(base, list(phases)) 
         for phases in permutations([0, 1, 2, 3, 4]))
 
-def run_thrusters_feedback(code: List[str], phases: List[int]) -> int:
-    output = [0]
-    halts = [False] * len(phases)
-    programs = [Program(code[:], input=[phase]) for phase in phases]
-    while not all(halts):
-        for i, program in enumerate(programs):
-            program.input = output + program.input
-            _, halts[i] = run_until_output(program)
-            if not halts[i]:
-                output, program.output = program.output, []
-    return output[0]
+def run_thrusters_feedback(base: Program, phases: List[int]) -> int:
+    programs = [base.fork() for _ in phases]
+    for program, phase in zip(programs, phases):
+        program.add_input(phase)
+    network = ring(programs)
+    network.send(0, 0)
+    network.run()
+    # The final output of the last amplifier is left waiting for the first.
+    return network.pending(0)[-1]
 
 def max_thrust_feedback(code: List[int]) -> int:
+    base = Program(code)
     return max(
-        run_thrusters_feedback(code[:], list(phases)) 
+        run_thrusters_feedback(base, list(phases)) 
         for phases in permutations([5, 6, 7, 8, 9]))
 
 #CODE = [3,8,1001,8,10,8,105,1,0,0,21,46,67,76,97,118,199,280,361,442,99999,3,9,1002,9,3,9,101,4,9,9,102,3,9,9,1001,9,3,9,1002,9,2,9,4,9,99,3,9,102,2,9,9,101,5,9,9,1002,9,2,9,101,2,9,9,4,9,99,3,9,101,4,9,9,4,9,99,3,9,1001,9,4,9,102,2,9,9,1001,9,4,9,1002,9,5,9,4,9,99,3,9,102,3,9,9,1001,9,2,9,1002,9,3,9,1001,9,3,9,4,9,99,3,9,101,1,9,9,4,9,3,9,1001,9,2,9,4,9,3,9,1001,9,1,9,4,9,3,9,1001,9,1,9,4,9,3,9,101,2,9,9,4,9,3,9,102,2,9,9,4,9,3,9,1002,9,2,9,4,9,3,9,1002,9,2,9,4,9,3,9,1001,9,2,9,4,9,3,9,101,1,9,9,4,9,99,3,9,102,2,9,9,4,9,3,9,101,2,9,9,4,9,3,9,102,2,9,9,4,9,3,9,1002,9,2,9,4,9,3,9,102,2,9,9,4,9,3,9,1001,9,2,9,4,9,3,9,1001,9,1,9,4,9,3,9,102,2,9,9,4,9,3,9,101,1,9,9,4,9,3,9,101,2,9,9,4,9,99,3,9,1002,9,2,9,4,9,3,9,1001,9,1,9,4,9,3,9,101,2,9,9,4,9,3,9,1002,9,2,9,4,9,3,9,102,2,9,9,4,9,3,9,1001,9,1,9,4,9,3,9,1002,9,2,9,4,9,3,9,101,1,9,9,4,9,3,9,1002,9,2,9,4,9,3,9,1001,9,1,9,4,9,99,3,9,1001,9,2,9,4,9,3,9,1002,9,2,9,4,9,3,9,1002,9,2,9,4,9,3,9,101,2,9,9,4,9,3,9,1001,9,1,9,4,9,3,9,101,1,9,9,4,9,3,9,1001,9,2,9,4,9,3,9,1001,9,1,9,4,9,3,9,1002,9,2,9,4,9,3,9,1001,9,1,9,4,9,99,3,9,1002,9,2,9,4,9,3,9,101,2,9,9,4,9,3,9,1002,9,2,9,4,9,3,9,101,2,9,9,4,9,3,9,1001,9,2,9,4,9,3,9,101,1,9,9,4,9,3,9,102,2,9,9,4,9,3,9,102,2,9,9,4,9,3,9,1001,9,2,9,4,9,3,9,1002,9,2,9,4,9,99]
@@ -1,27 +1,104 @@
-from collections import Counter
+import os
+from typing import BinaryIO, Iterator, Optional, Union
+import numpy as np
 
-def iter_layer(img, width, height):
-    for n in range(len(img) // (width * height)):
-        yield img[n * width * height: (n + 1) * width * height]
+BLACK, WHITE, TRANSPARENT = 0, 1, 2
+N_DIGITS = 10
+# Pixels decoded at a time, in whole layers, bounding memory however many or
+# large the layers are.
+DEFAULT_CHUNK_PIXELS = 1 << 22
 
-def first_non_two(s):
-    for ch in s:
-        if ch != '2':
-            return ch
-    return '2'
+Source = Union[str, BinaryIO]
 
-IMG = open('./data/input.txt', 'r').read().strip()
-layer_counts = [Counter(layer) for layer in iter_layer(IMG, width=25, height=6)]
-min_zero_layer = min(layer_counts, key=lambda d: d['0'])
-print(min_zero_layer)
-print(f"The product of 1's and 2's in the minumum zero layer is {min_zero_layer['1'] * min_zero_layer['2']}")
 
-layers = list(iter_layer(IMG, width=25, height=6))
+def iter_layer_chunks(
+    source: Source, width: int, height: int,
+    chunk_layers: Optional[int] = None) -> Iterator[np.ndarray]:
+    '''Decode an image into (layers, height, width) arrays of digits, a chunk
+    of layers at a time.
 
-message = []
-for i in range(25 * 6):
-    pixels = [layer[i] for layer in layers]
-    message.append(int(first_non_two(pixels)))
+    A path is memory mapped and sliced, a binary file is streamed. By default
+    chunks hold whole layers up to about DEFAULT_CHUNK_PIXELS pixels. Trailing
+    partial layers, such as a final newline, are ignored.
+    '''
+    layer_size = width * height
+    if chunk_layers is None:
+        chunk_layers = max(DEFAULT_CHUNK_PIXELS // layer_size, 1)
+    if isinstance(source, str):
+        if not os.path.getsize(source):
+            return
+        data = np.memmap(source, dtype=np.uint8, mode='r')
+        n_layers = len(data) // layer_size
+        for start in range(0, n_layers, chunk_layers):
+            stop = min(start + chunk_layers, n_layers)
+            yield decode(data[start * layer_size : stop * layer_size], width, height)
+    else:
+        chunk_size = chunk_layers * layer_size
+        buffer = bytearray()
+        at_end = False
+        while not at_end:
+            # Reads may come back short, so keep reading until the chunk is
+            # full or the stream ends.
+            while len(buffer) < chunk_size:
+                raw = source.read(chunk_size - len(buffer))
+                if not raw:
+                    at_end = True
+                    break
+                buffer += raw
+            n_bytes = len(buffer) // layer_size * layer_size
+            if n_bytes:
+                yield decode(np.frombuffer(bytes(buffer[:n_bytes]), dtype=np.uint8), width, height)
+                # A partial layer is carried over into the next chunk.
+                del buffer[:n_bytes]
 
-for i in range(6):
-    print(''.join([['.', '#'][i] for i in message[i*25: (i+1)*25] ]))
+def decode(raw: np.ndarray, width: int, height: int) -> np.ndarray:
+    digits = raw - np.uint8(ord('0'))
+    # Anything below '0' wraps around, so one comparison checks every digit.
+    if digits.size and digits.max() >= N_DIGITS:
+        raise ValueError("Image data contains a non digit character.")
+    return digits.reshape(-1, height, width)
+
+def layer_histograms(
+    source: Source, width: int, height: int,
+    chunk_layers: Optional[int] = None) -> np.ndarray:
+    '''The count of each digit in each layer, as a (layers, 10) array.'''
+    histograms = []
+    for layers in iter_layer_chunks(source, width, height, chunk_layers):
+        # Offsetting each layer's digits lets one bincount cover the chunk.
+        offsets = np.arange(len(layers), dtype=np.int64)[:, None, None] * N_DIGITS
+        counts = np.bincount((layers + offsets).ravel(), minlength=len(layers) * N_DIGITS)
+        histograms.append(counts.reshape(len(layers), N_DIGITS))
+    return np.concatenate(histograms) if histograms else np.zeros((0, N_DIGITS), dtype=np.int64)
+
+def checksum(histograms: np.ndarray) -> int:
+    '''The product of the 1 and 2 digit counts of the layer with fewest 0s.'''
+    layer = histograms[histograms[:, 0].argmin()]
+    return int(layer[1] * layer[2])
+
+def composite(
+    source: Source, width: int, height: int,
+    chunk_layers: Optional[int] = None) -> np.ndarray:
+    '''Stack the layers, each pixel taking its first non-transparent value.
+
+    Decoding stops as soon as no transparent pixels remain.
+    '''
+    image = np.full((height, width), TRANSPARENT, dtype=np.uint8)
+    for layers in iter_layer_chunks(source, width, height, chunk_layers):
+        opaque = layers != TRANSPARENT
+        first = np.take_along_axis(layers, opaque.argmax(axis=0)[None], axis=0)[0]
+        transparent = image == TRANSPARENT
+        image[transparent] = first[transparent]
+        if not (image == TRANSPARENT).any():
+            break
+    return image
+
+
+if __name__ == '__main__':
+    histograms = layer_histograms('./data/input.txt', width=25, height=6)
+    min_zero_layer = histograms[histograms[:, 0].argmin()]
+    print({digit: int(count) for digit, count in enumerate(min_zero_layer) if count})
+    print(f"The product of 1's and 2's in the minumum zero layer is {checksum(histograms)}")
+
+    message = composite('./data/input.txt', width=25, height=6)
+    for row in np.array(['.', '#', ' '])[message]:
+        print(''.join(row))
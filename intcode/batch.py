@@ -0,0 +1,78 @@
+'''Parallel search over program inputs.
+
+A batch runs one program image under many configurations, each a set of
+memory patches plus an input vector, sharded over a process pool. Every
+worker loads the image once and forks it for each configuration, and results
+are streamed back as they complete.
+'''
+from multiprocessing import Pool
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence
+
+from intcode.intcode import Program, run, INTERPRETER_ENGINE
+
+
+class Configuration(NamedTuple):
+    patches: Dict[int, int] = {}
+    inputs: Sequence[int] = ()
+
+
+class BatchResult(NamedTuple):
+    configuration: Configuration
+    output: List[int]
+    # Memory contents at the requested addresses once the run stops.
+    memory: Dict[int, int]
+    halted: bool
+
+
+# Per worker state, set up by the pool initializer.
+WORKER_PROGRAM: Optional[Program] = None
+WORKER_ENGINE = INTERPRETER_ENGINE
+WORKER_ADDRESSES: Sequence[int] = ()
+
+
+def run_batch(
+    code: List[int],
+    configurations: Iterable[Configuration],
+    read_addresses: Sequence[int]=(),
+    until: Optional[Callable[[BatchResult], bool]]=None,
+    processes: Optional[int]=None,
+    chunksize: int=64,
+    ordered: bool=False,
+    engine: str=INTERPRETER_ENGINE) -> Iterator[BatchResult]:
+    '''Run code under each configuration, yielding results as they complete.
+
+    Results arrive in completion order unless ordered is set. If until is
+    given, the batch stops after the first result it accepts, and the
+    remaining work is abandoned.
+    '''
+    with Pool(
+        processes=processes,
+        initializer=initialize_worker,
+        initargs=(code, engine, read_addresses)) as pool:
+        imap = pool.imap if ordered else pool.imap_unordered
+        for result in imap(run_configuration, configurations, chunksize=chunksize):
+            yield result
+            if until and until(result):
+                break
+        # Leaving the pool's context terminates any outstanding work.
+
+
+def initialize_worker(code: List[int], engine: str, read_addresses: Sequence[int]) -> None:
+    global WORKER_PROGRAM, WORKER_ENGINE, WORKER_ADDRESSES
+    WORKER_PROGRAM = Program(code)
+    WORKER_ENGINE = engine
+    WORKER_ADDRESSES = read_addresses
+
+
+def run_configuration(configuration: Configuration) -> BatchResult:
+    assert WORKER_PROGRAM is not None
+    program = WORKER_PROGRAM.fork()
+    for address, value in configuration.patches.items():
+        program[address] = value
+    program.add_input(*configuration.inputs)
+    _, halt = run(program, engine=WORKER_ENGINE)
+    return BatchResult(
+        configuration,
+        list(program.output),
+        {address: program[address] for address in WORKER_ADDRESSES},
+        halt)
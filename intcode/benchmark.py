@@ -0,0 +1,360 @@
+'''Benchmarks driving every day's intcode program headlessly.
+
+Programs are loaded from each day's data file, or parsed out of the literal
+embedded in its script without running it, and driven with scripted input.
+Each workload reports wall time, instructions per second, peak traced memory
+and the memory blocks it allocated that were still alive when it finished, per
+engine, and can be compared against stored baselines:
+
+    python -m intcode.benchmark --engine interpreter compiled --save
+    python -m intcode.benchmark --engine interpreter compiled --threshold 0.1
+
+Wall times depend on the machine, so baselines are stored locally rather than
+shipped, and results with no baseline are reported as unchecked.
+
+With --check, a set of edge case programs is first run on every engine given,
+failing if any engine's output or error differs from the interpreter's, and a
+run with profiling and checkpointing both enabled is checked on each engine.
+'''
+import argparse
+import ast
+import json
+import os
+import sys
+import tempfile
+import tracemalloc
+from itertools import permutations
+from time import perf_counter
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from intcode.intcode import (
+    Program, run, run_until_output, INTERPRETER_ENGINE, COMPILED_ENGINE)
+from intcode.profiler import Profiler
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(ROOT, 'benchmark_baseline.json')
+DEFAULT_THRESHOLD = 0.1
+
+Workload = Callable[[str, Optional[Profiler]], None]
+
+
+class BenchmarkResult(NamedTuple):
+    workload: str
+    engine: str
+    wall_time: float
+    instructions: int
+    peak_memory: int
+    retained_blocks: int
+
+    @property
+    def instructions_per_second(self) -> float:
+        return self.instructions / self.wall_time if self.wall_time else 0.0
+
+
+def load_file(day: int, name: str) -> List[int]:
+    with open(os.path.join(ROOT, str(day), 'data', name)) as f:
+        return [int(x) for x in f.read().strip().split(',')]
+
+
+def load_embedded(day: int, script: str, name: str) -> List[int]:
+    '''Parse the literal assigned to name in a day's script, without running it.'''
+    with open(os.path.join(ROOT, str(day), script)) as f:
+        tree = ast.parse(f.read())
+    for node in tree.body:
+        if (isinstance(node, ast.Assign)
+            and any(isinstance(t, ast.Name) and t.id == name for t in node.targets)):
+            return ast.literal_eval(node.value)
+    raise ValueError(f"No {name} in day {day}'s {script}.")
+
+
+def new_program(
+    code: List[int],
+    profiler: Optional[Profiler],
+    input: Optional[List[int]]=None) -> Program:
+    program = Program(code, input=input)
+    program.profiler = profiler
+    return program
+
+
+# Workloads.
+def day_5(engine: str, profiler: Optional[Profiler]) -> None:
+    code = load_embedded(5, 'thermal_environment_supervision_terminal.py', 'CODE')
+    for system_id in (1, 5):
+        run(new_program(code, profiler, input=[system_id]), engine=engine)
+
+def day_7(engine: str, profiler: Optional[Profiler]) -> None:
+    base = new_program(load_embedded(7, 'optimize_thrusters.py', 'CODE'), profiler)
+    for phases in permutations(range(5)):
+        signal = 0
+        for phase in phases:
+            program = base.fork()
+            program.add_input(phase, signal)
+            run(program, engine=engine)
+            signal = program.output[0]
+    for phases in permutations(range(5, 10)):
+        programs = [base.fork() for _ in phases]
+        for program, phase in zip(programs, phases):
+            program.add_input(phase)
+        signals, halt = [0], False
+        while not halt:
+            for program in programs:
+                program.add_input(*signals)
+                _, halt = run_until_output(program, engine=engine)
+                signals = list(program.output)
+                program.reset_output()
+
+def day_9(engine: str, profiler: Optional[Profiler]) -> None:
+    code = load_embedded(9, 'BOOST.py', 'BOOST')
+    for mode in (1, 2):
+        run(new_program(code, profiler, input=[mode]), engine=engine)
+
+def day_11(engine: str, profiler: Optional[Profiler]) -> None:
+    program = new_program(load_embedded(11, 'painter_robot.py', 'CODE'), profiler)
+    increments = [(0, 1), (-1, 0), (0, -1), (1, 0)]
+    painted: Dict[Tuple[int, int], int] = {(0, 0): 1}
+    position, facing = (0, 0), 0
+    while True:
+        program.add_input(painted.get(position, 0))
+        _, halt = run_until_output(program, 2, engine=engine)
+        if halt:
+            break
+        painted[position] = program.output.popleft()
+        facing = (facing + (1 if program.output.popleft() == 0 else -1)) % 4
+        position = (position[0] + increments[facing][0], position[1] + increments[facing][1])
+
+def day_13(engine: str, profiler: Optional[Profiler]) -> None:
+    program = new_program(load_file(13, 'game.txt'), profiler)
+    program[0] = 2
+    ball = paddle = 0
+    halt = False
+    while not halt:
+        _, halt = run(program, engine=engine)
+        while program.output:
+            x, _, tile_id = (program.output.popleft() for _ in range(3))
+            if tile_id == 3:
+                paddle = x
+            elif tile_id == 4:
+                ball = x
+        program.add_input((ball > paddle) - (ball < paddle))
+
+def day_15(engine: str, profiler: Optional[Profiler]) -> None:
+    program = new_program(load_file(15, 'program.txt'), profiler)
+    moves = {1: (0, 1), 2: (0, -1), 3: (-1, 0), 4: (1, 0)}
+    reverse = {1: 2, 2: 1, 3: 4, 4: 3}
+    position = (0, 0)
+    seen = {position}
+    path: List[int] = []
+    # Depth first exploration of the whole map, backtracking along the path.
+    while True:
+        for direction, (dx, dy) in moves.items():
+            target = (position[0] + dx, position[1] + dy)
+            if target in seen:
+                continue
+            seen.add(target)
+            program.add_input(direction)
+            run_until_output(program, engine=engine)
+            if program.output.popleft():
+                position = target
+                path.append(direction)
+                break
+        else:
+            if not path:
+                break
+            direction = reverse[path.pop()]
+            program.add_input(direction)
+            run_until_output(program, engine=engine)
+            program.output.popleft()
+            dx, dy = moves[direction]
+            position = (position[0] + dx, position[1] + dy)
+
+def day_17(engine: str, profiler: Optional[Profiler]) -> None:
+    run(new_program(load_file(17, 'ascii.txt'), profiler), engine=engine)
+
+
+WORKLOADS: Dict[str, Workload] = {
+    'day_5': day_5,
+    'day_7': day_7,
+    'day_9': day_9,
+    'day_11': day_11,
+    'day_13': day_13,
+    'day_15': day_15,
+    'day_17': day_17,
+}
+
+
+# Edge case programs run on every engine, with their input.
+ENGINE_CHECKS: Dict[str, Tuple[List[int], List[int]]] = {
+    'negative_write': ([1101, 7, 8, -1, 4, -1, 99], []),
+    'negative_read': ([4, -3, 99], []),
+    'negative_relative': ([109, -5, 204, 0, 99], []),
+    'large_address': ([1101, 7, 8, 10 ** 9, 4, 10 ** 9, 99], []),
+    'self_modifying': ([3, 7, 1101, 1, 1, 11, 104, 0, 99, 0, 0, 0], [4]),
+    'relative_io': ([109, 10, 203, 0, 204, 0, 99], [42]),
+    'undecodable_after_halt': ([1101, 1, 98, 4, -10], []),
+    'untaken_bad_jump': ([5, 36, -3, 99], []),
+    'taken_jump': ([1105, 0, -3, 99], []),
+    'error_mid_block': ([109, 3, 21101, 1, 2, -1, 1101, 1, 1, 9, 4, -7, 99], []),
+    'relative_error_mid_block': ([1101, 5, 5, 20, 109, 4, 1001, -1, 0, 3, 99], []),
+}
+
+
+CheckResult = Tuple[str, List[int], int, int, List[int]]
+
+
+def run_check(code: List[int], input: List[int], engine: str) -> CheckResult:
+    '''The name of the error raised, if any, the output produced, and the
+    instruction pointer, relative base and memory left behind.'''
+    program = Program(list(code), input=list(input))
+    error = ''
+    try:
+        run(program, engine=engine)
+    except Exception as e:
+        error = type(e).__name__
+    return (
+        error, list(program.output), program.instruction_ptr, program.relative_base,
+        program[0:len(code)])
+
+
+def check_engines(engines: List[str]) -> List[str]:
+    '''Checks whose results on any of engines differ from the interpreter's.'''
+    failures = []
+    for name, (code, input) in ENGINE_CHECKS.items():
+        expected = run_check(code, input, INTERPRETER_ENGINE)
+        for engine in engines:
+            result = run_check(code, input, engine)
+            if result != expected:
+                failures.append(
+                    f"{name} on {engine} gave {result} against the interpreter's {expected}.")
+    return failures
+
+
+def check_hooks(engines: List[str]) -> List[str]:
+    '''Run day 5 with a profiler and a checkpointer both enabled, failing if
+    either misses part of the run or the output changes.'''
+    failures = []
+    code = load_embedded(5, 'thermal_environment_supervision_terminal.py', 'CODE')
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'checkpoint')
+        for engine in engines:
+            # Compiled instruction counts are approximate, so the reference
+            # run is profiled on the same engine.
+            expected = Program(code, input=[5])
+            expected_profiler = expected.enable_profiling()
+            run(expected, engine=engine)
+            program = Program(code, input=[5])
+            profiler = program.enable_profiling()
+            checkpointer = program.enable_checkpoints(path, every=20)
+            run(program, engine=engine)
+            if list(program.output) != list(expected.output):
+                failures.append(f"hooks on {engine} gave output {list(program.output)}.")
+            if profiler.instructions != expected_profiler.instructions:
+                failures.append(
+                    f"hooks on {engine} profiled {profiler.instructions} instructions "
+                    f"against {expected_profiler.instructions}.")
+            if not checkpointer.saves or checkpointer.instructions != profiler.instructions:
+                failures.append(
+                    f"hooks on {engine} saved {checkpointer.saves} checkpoints over "
+                    f"{checkpointer.instructions} instructions.")
+    return failures
+
+
+def benchmark(name: str, engine: str, repeat: int=1) -> BenchmarkResult:
+    workload = WORKLOADS[name]
+    # Instruction counts come from a separate profiled run so that the timed
+    # runs are not slowed down by profiling.
+    profiler = Profiler()
+    workload(INTERPRETER_ENGINE, profiler)
+    wall_time = float('inf')
+    for _ in range(repeat):
+        start = perf_counter()
+        workload(engine, None)
+        wall_time = min(wall_time, perf_counter() - start)
+    # Only blocks allocated after tracing starts are traced, so the snapshot
+    # holds those the workload allocated and did not free. tracemalloc keeps
+    # no count of blocks allocated and freed again.
+    tracemalloc.start()
+    workload(engine, None)
+    _, peak_memory = tracemalloc.get_traced_memory()
+    snapshot = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    retained_blocks = sum(stat.count for stat in snapshot.statistics('filename'))
+    return BenchmarkResult(
+        name, engine, wall_time, profiler.instructions, peak_memory, retained_blocks)
+
+
+def load_baselines(path: str) -> Dict[str, float]:
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baselines(path: str, results: List[BenchmarkResult]) -> None:
+    baselines = load_baselines(path)
+    baselines.update({f"{r.workload}/{r.engine}": r.wall_time for r in results})
+    with open(path, 'w') as f:
+        json.dump(baselines, f, indent=2, sort_keys=True)
+
+
+def find_regressions(
+    results: List[BenchmarkResult],
+    baselines: Dict[str, float],
+    threshold: float=DEFAULT_THRESHOLD) -> List[Tuple[BenchmarkResult, float]]:
+    '''Results slower than their baseline by more than threshold.'''
+    regressions = []
+    for result in results:
+        baseline = baselines.get(f"{result.workload}/{result.engine}")
+        if baseline and result.wall_time > baseline * (1 + threshold):
+            regressions.append((result, baseline))
+    return regressions
+
+
+def main(argv: Optional[List[str]]=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--workload', nargs='+', choices=list(WORKLOADS), default=list(WORKLOADS))
+    parser.add_argument(
+        '--engine', nargs='+', choices=[INTERPRETER_ENGINE, COMPILED_ENGINE],
+        default=[INTERPRETER_ENGINE])
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument('--save', action='store_true', help="Store the results as baselines.")
+    parser.add_argument(
+        '--check', action='store_true', help="Compare the engines on edge case programs first.")
+    args = parser.parse_args(argv)
+
+    if args.check:
+        failures = check_engines(args.engine) + check_hooks(args.engine)
+        for failure in failures:
+            print(f"Mismatch: {failure}")
+        if failures:
+            return 1
+
+    results = []
+    print(f"{'workload':<10}{'engine':<13}{'wall (s)':>10}{'instructions':>14}"
+          f"{'instr/s':>12}{'peak (KiB)':>12}{'retained blocks':>17}")
+    for name in args.workload:
+        for engine in args.engine:
+            result = benchmark(name, engine, repeat=args.repeat)
+            results.append(result)
+            print(f"{name:<10}{engine:<13}{result.wall_time:>10.3f}{result.instructions:>14}"
+                  f"{result.instructions_per_second:>12.0f}{result.peak_memory / 1024:>12.0f}"
+                  f"{result.retained_blocks:>17}")
+    if args.save:
+        save_baselines(args.baseline, results)
+        return 0
+    baselines = load_baselines(args.baseline)
+    missing = [r for r in results if f"{r.workload}/{r.engine}" not in baselines]
+    if missing:
+        print(f"Warning: no baseline in {args.baseline} for "
+              f"{', '.join(f'{r.workload}/{r.engine}' for r in missing)}, so they were not "
+              f"checked for regressions. Store baselines with --save.", file=sys.stderr)
+    regressions = find_regressions(results, baselines, args.threshold)
+    for result, baseline in regressions:
+        print(f"Regression: {result.workload} on {result.engine} took "
+              f"{result.wall_time:.3f}s against a baseline of {baseline:.3f}s.")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
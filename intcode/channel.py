@@ -0,0 +1,60 @@
+'''FIFO channels for feeding input to and collecting output from programs.'''
+from collections import deque
+from typing import Callable, Iterable, List, Optional
+
+
+class Channel(deque):
+    '''A first in first out queue of intcode values.
+
+    A channel with a capacity applies backpressure, a program suspends rather
+    than write to a full output channel, and putting a value into a full
+    channel raises. If a sink is given, values put into the channel are handed
+    straight to it instead of being buffered. A listener, if set, is told about
+    every value put. If log is a list, every value added to the channel is
+    also appended to it, recording input for later replay.
+    '''
+
+    def __init__(
+        self,
+        values: Iterable[int]=(),
+        capacity: Optional[int]=None,
+        sink: Optional[Callable[[int], None]]=None):
+        super().__init__(values)
+        self.capacity = capacity
+        self.sink = sink
+        self.listener: Optional[Callable[[int], None]] = None
+        self.log: Optional[List[int]] = None
+
+    def append(self, value: int) -> None:
+        super().append(value)
+        if self.log is not None:
+            self.log.append(value)
+
+    def extend(self, values: Iterable[int]) -> None:
+        for value in values:
+            self.append(value)
+
+    def full(self) -> bool:
+        return self.capacity is not None and len(self) >= self.capacity
+
+    def put(self, value: int) -> None:
+        if self.sink:
+            self.sink(value)
+        elif self.full():
+            raise OverflowError(f"Channel is at capacity {self.capacity}.")
+        else:
+            self.append(value)
+        if self.listener:
+            self.listener(value)
+
+    def get(self) -> int:
+        return self.popleft()
+
+    def copy(self) -> 'Channel':
+        channel = Channel(self, capacity=self.capacity, sink=self.sink)
+        if self.log is not None:
+            channel.log = self.log[:]
+        return channel
+
+    def __repr__(self) -> str:
+        return f"Channel({list(self)})"
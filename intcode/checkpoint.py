@@ -0,0 +1,213 @@
+'''Checkpoints and deterministic replay for long running programs.
+
+A checkpoint holds the full state of a program: its registers, any pending
+suspension, memory, buffered input and output, and its input log if one is
+being recorded. It is stored as a small versioned header followed by zlib
+compressed JSON, with pages that hold only zeros left out. Output sinks and
+listeners are callbacks, so they are not saved.
+
+Checkpointing is opt in, through Program.enable_checkpoints, and the
+checkpointer is a RunHook, so it is driven by the usual run loops alongside
+any other hooks such as a profiler. Checkpoints are written to a temporary
+file and moved into place, so a program killed part way through saving still
+leaves the previous checkpoint intact.
+
+Checkpoints are taken during runs, so a driver feeding a program can store its
+own state alongside it as a JSON payload, returned by a callback at each save
+and handed back by resume. Drivers that only change their state between runs
+then resume by running the program again. With the
+compiled engine checkpoints are taken at block boundaries, so the interval is
+approximate.
+
+Programs are deterministic given their input, so a run recorded with
+Program.record_input can also be reproduced from the state it started in by
+replaying the logged input.
+'''
+import json
+import os
+import struct
+import zlib
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import numpy as np
+
+from intcode.intcode import Program, Instruction, RunHook, run, INTERPRETER_ENGINE
+from intcode.grid import Grid
+from intcode.memory import Memory, PAGE_SIZE, ZERO_PAGE
+
+MAGIC = b'ICCP'
+VERSION = 1
+# Magic and version.
+HEADER = struct.Struct('<4sH')
+
+
+class CheckpointError(ValueError):
+    pass
+
+
+class Checkpointer(RunHook):
+
+    def __init__(self, path: str, every: int, payload: Optional[Callable[[], Any]]=None):
+        if every < 1:
+            raise ValueError(f"Cannot checkpoint every {every} instructions.")
+        self.path = path
+        self.every = every
+        self.payload = payload
+        # Instructions run since checkpointing began, carried over on resume.
+        self.instructions = 0
+        self.next_save = every
+        self.saves = 0
+
+    def stepped(
+        self,
+        program: Program,
+        ptr: int,
+        relative_base: int,
+        instruction: Instruction,
+        elapsed: float) -> None:
+        self.advance(program, 1)
+
+    def ran_block(self, program: Program, ptr: int, n_instructions: int) -> None:
+        self.advance(program, n_instructions)
+
+    def advance(self, program: Program, n_instructions: int) -> None:
+        self.instructions += n_instructions
+        if self.instructions >= self.next_save:
+            self.save(program)
+
+    def save(self, program: Program) -> None:
+        save(program, self.path)
+        self.saves += 1
+        self.next_save = self.instructions + self.every
+
+
+def memory_state(memory: Memory) -> Dict:
+    return {
+        'n_pages': len(memory.pages),
+        'pages': [
+            [index, list(page)] for index, page in enumerate(memory.pages)
+            if page is not ZERO_PAGE and any(page)],
+        'overlay': sorted(memory.overlay.items()),
+        'limit': memory.limit,
+    }
+
+
+def memory_from_state(state: Dict) -> Memory:
+    memory = Memory.from_pages([ZERO_PAGE] * state['n_pages'], limit=state['limit'])
+    for index, values in state['pages']:
+        if len(values) != PAGE_SIZE:
+            raise CheckpointError(f"Page {index} holds {len(values)} cells.")
+        memory.pages[index] = values
+        memory.owned[index] = True
+    memory.overlay = {address: value for address, value in state['overlay']}
+    memory.footprint = len(state['pages']) * PAGE_SIZE + len(memory.overlay)
+    memory.peak_footprint = memory.footprint
+    return memory
+
+
+def grid_state(grid: Grid) -> Dict:
+    '''The cells within a grid's bounds, for driver payloads.'''
+    min_x, min_y = grid.bounds[:2] if grid.bounds else (0, 0)
+    return {'fill': grid.fill, 'min_x': min_x, 'min_y': min_y, 'cells': grid.view().tolist()}
+
+
+def grid_from_state(state: Dict) -> Grid:
+    if not state['cells']:
+        return Grid(fill=state['fill'])
+    cells = np.array(state['cells'], dtype=np.int64)
+    return Grid.from_array(cells, state['min_x'], state['min_y'], fill=state['fill'])
+
+
+def program_state(program: Program) -> Dict:
+    checkpointer = program.checkpointer
+    return {
+        'instruction_ptr': program.instruction_ptr,
+        'relative_base': program.relative_base,
+        'restore': program.restore,
+        'opcode_memory': program.opcode_memory,
+        'memory': memory_state(program.memory),
+        'input': list(program.input),
+        'input_log': program.input.log,
+        'output': list(program.output),
+        'output_capacity': program.output.capacity,
+        'instructions': checkpointer.instructions if checkpointer else 0,
+        'payload': checkpointer.payload() if checkpointer and checkpointer.payload else None,
+    }
+
+
+def program_from_state(state: Dict) -> Program:
+    program = Program(
+        [], input=state['input'], output_capacity=state['output_capacity'])
+    program.memory = memory_from_state(state['memory'])
+    program.output.extend(state['output'])
+    program.input.log = state['input_log']
+    program.instruction_ptr = state['instruction_ptr']
+    program.relative_base = state['relative_base']
+    program.restore = state['restore']
+    program.opcode_memory = state['opcode_memory']
+    return program
+
+
+def dumps(program: Program) -> bytes:
+    encoded = json.dumps(program_state(program), separators=(',', ':')).encode()
+    return HEADER.pack(MAGIC, VERSION) + zlib.compress(encoded)
+
+
+def loads_state(data: bytes) -> Dict:
+    if len(data) < HEADER.size:
+        raise CheckpointError("Checkpoint is truncated.")
+    magic, version = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise CheckpointError(f"Not a version {VERSION} checkpoint.")
+    try:
+        return json.loads(zlib.decompress(data[HEADER.size:]))
+    except (zlib.error, ValueError) as e:
+        raise CheckpointError(f"Corrupt checkpoint: {e}") from e
+
+
+def loads(data: bytes) -> Program:
+    return program_from_state(loads_state(data))
+
+
+def save(program: Program, path: str) -> None:
+    temporary_path = path + '.tmp'
+    with open(temporary_path, 'wb') as f:
+        f.write(dumps(program))
+    os.replace(temporary_path, path)
+
+
+def load(path: str) -> Program:
+    with open(path, 'rb') as f:
+        return loads(f.read())
+
+
+def resume(path: str, every: Optional[int]=None) -> Tuple[Program, Any]:
+    '''Load a checkpoint and the payload saved with it, and if every is given
+    keep checkpointing to it.
+
+    The new checkpointer has no payload callback, as the driver it would
+    describe is usually rebuilt from the payload returned here.
+    '''
+    with open(path, 'rb') as f:
+        state = loads_state(f.read())
+    program = program_from_state(state)
+    if every:
+        checkpointer = program.enable_checkpoints(path, every)
+        checkpointer.instructions = state['instructions']
+        checkpointer.next_save = checkpointer.instructions + every
+    return program, state.get('payload')
+
+
+def replay(
+    program: Program,
+    input_log: List[int],
+    engine: str=INTERPRETER_ENGINE) -> Tuple[Program, bool]:
+    '''Reproduce a recorded run from the state recording began in.
+
+    A fork of the program is given the whole log up front and run until it
+    halts or runs out of input, ending in the state the recorded program
+    reached after consuming the same input.
+    '''
+    replayed = program.fork()
+    replayed.add_input(*input_log)
+    return run(replayed, engine=engine)
+
@@ -0,0 +1,279 @@
+'''A compiling execution engine for intcode programs.
+
+Basic blocks of a program are translated into generated Python functions with
+the parameter modes resolved at compile time, so a block of straight line code
+runs without any per instruction dispatch. A block ends after a jump, output
+or halt, and just before an input, so the run's matcher is still checked after
+every output and input suspension happens at a block boundary.
+
+Writes landing inside a compiled block invalidate it, and its addresses are
+then executed by the interpreter.
+'''
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from intcode.intcode import (
+    Program, RunHook, step, hooked_step, parse_opcode, OP_CODE_TABLE,
+    POSITION_MODE, IMMEDIATE_MODE, RELATIVE_MODE,
+    ADD_OP_CODE, MULTIPLY_OP_CODE, INPUT_OPCODE, OUTPUT_OPCODE,
+    JUMP_IF_TRUE_OPCODE, JUMP_IF_FALSE_OPCODE, LESS_THAN_OPCODE,
+    EQUALS_OPCODE, ADJUST_RELATIVE_BASE_OPCODE, HALT_OP_CODE)
+from intcode.matchers import OutputMatcher
+from intcode.memory import PAGE_BITS, PAGE_MASK, MAX_DENSE_PAGES
+
+# Upper bound on the number of instructions translated into one block.
+MAX_BLOCK_LENGTH = 64
+
+BlockFunction = Callable[[Program], bool]
+DecodedInstruction = Tuple[int, int, List[int], List[int]]  # ptr, full opcode, parameters, modes
+
+
+class CompiledBlock(NamedTuple):
+    function: BlockFunction
+    end: int
+    n_instructions: int
+
+
+# Generated functions only depend on the block's start address and memory
+# contents, so they are shared between all programs running the same code.
+BLOCK_CACHE: Dict[Tuple[int, Tuple[int, ...]], BlockFunction] = {}
+
+
+def run_compiled(
+    program: Program,
+    matcher: OutputMatcher,
+    hooks: Sequence[RunHook]=()) -> Tuple[Program, bool]:
+    halt = False
+    # Resuming from an input suspension, the input instruction is simply
+    # re-executed from the top of its block.
+    if program.restore and program.instruction_ptr not in program.interpreted_addresses:
+        program.restore, program.opcode_memory = False, None
+    while not (halt or matcher.matched):
+        ptr = program.instruction_ptr
+        block = program.compiled_blocks.get(ptr)
+        if block is None and not (program.restore or ptr in program.interpreted_addresses):
+            block = compile_block(program, ptr)
+        # Modified code runs in the interpreter, as does anything that cannot
+        # be decoded so the usual errors are raised.
+        if block is None:
+            program, halt = hooked_step(program, hooks) if hooks else step(program)
+        else:
+            halt = block.function(program)
+            if hooks:
+                for hook in hooks:
+                    if program.restore:
+                        hook.suspended(program)
+                    else:
+                        hook.ran_block(program, ptr, block.n_instructions)
+        if program.restore:
+            break
+    return program, halt
+
+
+def compile_block(program: Program, start: int) -> Optional[CompiledBlock]:
+    instructions = scan_block(program, start)
+    if not instructions:
+        return None
+    last_ptr, _, last_parameters, _ = instructions[-1]
+    end = last_ptr + len(last_parameters) + 1
+    key = (start, tuple(program[start:end]))
+    function = BLOCK_CACHE.get(key)
+    if function is None:
+        function = BLOCK_CACHE[key] = generate_block_function(instructions, end)
+    # Fixed addresses are accessed directly through the page table, so make
+    # sure it covers them.
+    program.memory.reserve(max(
+        [parameter
+         for _, _, parameters, modes in instructions
+         for parameter, mode in zip(parameters, modes) if mode == POSITION_MODE],
+        default=0))
+    block = CompiledBlock(function, end, len(instructions))
+    program.compiled_blocks[start] = block
+    program.cached_addresses.update(range(start, end))
+    for address in range(start, end):
+        program.block_addresses[address] = program.block_addresses.get(address, ()) + (start,)
+    return block
+
+
+def scan_block(program: Program, start: int) -> List[DecodedInstruction]:
+    instructions: List[DecodedInstruction] = []
+    ptr = start
+    while len(instructions) < MAX_BLOCK_LENGTH:
+        if ptr in program.interpreted_addresses:
+            break
+        full_opcode = program[ptr]
+        # Anything that cannot be decoded ends the block, and is left to the
+        # interpreter if it is ever reached.
+        try:
+            opcode, parameter_modes = parse_opcode(full_opcode)
+        except ValueError:
+            break
+        if opcode not in OP_CODE_TABLE:
+            break
+        # Input suspends the program, so it may only start a block.
+        if opcode == INPUT_OPCODE and instructions:
+            break
+        _, n_parameters = OP_CODE_TABLE[opcode]
+        parameter_modes = parameter_modes + [0]*(n_parameters - len(parameter_modes))
+        if any(mode not in (POSITION_MODE, IMMEDIATE_MODE, RELATIVE_MODE)
+               for mode in parameter_modes):
+            break
+        parameters = program[ptr + 1 : ptr + n_parameters + 1]
+        instructions.append((ptr, full_opcode, parameters, parameter_modes))
+        ptr += n_parameters + 1
+        if opcode in (OUTPUT_OPCODE, JUMP_IF_TRUE_OPCODE, JUMP_IF_FALSE_OPCODE, HALT_OP_CODE):
+            break
+    return instructions
+
+
+def generate_block_function(instructions: List[DecodedInstruction], end: int) -> BlockFunction:
+    '''Generate the function running a block.
+
+    The address of the instruction being run is tracked in a local, so that
+    an error raised part way through, such as an invalid memory access, leaves
+    the program at the failing instruction just as the interpreter does.
+    '''
+    lines = [
+        "def block(program):",
+        "    memory = program.memory",
+        "    pages, owned = memory.pages, memory.owned",
+        f"    extent = len(pages) << {PAGE_BITS}",
+        "    rb = program.relative_base",
+        "    watched = program.cached_addresses",
+        f"    at = {instructions[0][0]}",
+        "    try:",
+    ]
+    for i, (ptr, full_opcode, parameters, modes) in enumerate(instructions):
+        if i:
+            lines.append(f"        at = {ptr}")
+        lines.extend(
+            "        " + line
+            for line in generate_instruction(ptr, full_opcode, parameters, modes))
+    _, full_opcode, _, _ = instructions[-1]
+    opcode, _ = parse_opcode(full_opcode)
+    # Blocks cut short by their length or an undecodable instruction fall
+    # through to the next address.
+    if opcode not in (JUMP_IF_TRUE_OPCODE, JUMP_IF_FALSE_OPCODE, HALT_OP_CODE, OUTPUT_OPCODE):
+        lines.extend("        " + line for line in exit_block(end))
+    lines.extend([
+        "    except Exception:",
+        "        program.instruction_ptr = at",
+        "        program.relative_base = rb",
+        "        raise",
+    ])
+    namespace: Dict[str, BlockFunction] = {}
+    exec('\n'.join(lines), namespace)
+    return namespace['block']
+
+
+def generate_instruction(
+    ptr: int, full_opcode: int, parameters: List[int], modes: List[int]) -> List[str]:
+    opcode, _ = parse_opcode(full_opcode)
+    next_ptr = ptr + len(parameters) + 1
+    if opcode == ADD_OP_CODE:
+        return generate_write(next_ptr, parameters[2], modes[2],
+            f"{read(parameters[0], modes[0])} + {read(parameters[1], modes[1])}")
+    elif opcode == MULTIPLY_OP_CODE:
+        return generate_write(next_ptr, parameters[2], modes[2],
+            f"{read(parameters[0], modes[0])} * {read(parameters[1], modes[1])}")
+    elif opcode == LESS_THAN_OPCODE:
+        return generate_write(next_ptr, parameters[2], modes[2],
+            f"int({read(parameters[0], modes[0])} < {read(parameters[1], modes[1])})")
+    elif opcode == EQUALS_OPCODE:
+        return generate_write(next_ptr, parameters[2], modes[2],
+            f"int({read(parameters[0], modes[0])} == {read(parameters[1], modes[1])})")
+    elif opcode == INPUT_OPCODE:
+        return [
+            "if not program.input:",
+        ] + ["    " + line for line in suspend(ptr, full_opcode)] + generate_write(
+            next_ptr, parameters[0], modes[0], "program.input.popleft()")
+    elif opcode == OUTPUT_OPCODE:
+        return [
+            "if program.output.full():",
+        ] + ["    " + line for line in suspend(ptr, full_opcode)] + [
+            f"program.output.put({read(parameters[0], modes[0])})",
+        ] + exit_block(next_ptr)
+    elif opcode in (JUMP_IF_TRUE_OPCODE, JUMP_IF_FALSE_OPCODE):
+        # Both operands are read whether or not the jump is taken, as the
+        # interpreter does, so a bad target raises either way.
+        condition = "condition" if opcode == JUMP_IF_TRUE_OPCODE else "not condition"
+        return [
+            f"condition = {read(parameters[0], modes[0])}",
+            f"target = {read(parameters[1], modes[1])}",
+            f"program.instruction_ptr = target if {condition} else {next_ptr}",
+            "program.relative_base = rb",
+            "return False",
+        ]
+    elif opcode == ADJUST_RELATIVE_BASE_OPCODE:
+        return [f"rb += {read(parameters[0], modes[0])}"]
+    elif opcode == HALT_OP_CODE:
+        return [
+            f"program.instruction_ptr = {ptr}",
+            "program.relative_base = rb",
+            "return True",
+        ]
+    raise ValueError(f"Unknown opcode {opcode}.")
+
+
+def read(parameter: int, mode: int) -> str:
+    if mode == POSITION_MODE:
+        # Negative addresses take the slow path, which raises IndexError.
+        if parameter < 0 or parameter >> PAGE_BITS >= MAX_DENSE_PAGES:
+            return f"memory[{parameter}]"
+        return f"pages[{parameter >> PAGE_BITS}][{parameter & PAGE_MASK}]"
+    elif mode == IMMEDIATE_MODE:
+        return f"{parameter}"
+    elif mode == RELATIVE_MODE:
+        return (
+            f"(pages[x >> {PAGE_BITS}][x & {PAGE_MASK}] "
+            f"if 0 <= (x := rb + {parameter}) < extent else memory[x])")
+    else:
+        raise ValueError(f"Unknown parameter mode {mode}.")
+
+
+def generate_write(next_ptr: int, parameter: int, mode: int, value: str) -> List[str]:
+    '''Generate a memory write.
+
+    Writes to owned pages go straight to the page table, anything else takes
+    the memory's slow path. A write landing on a cached instruction or
+    compiled block, possibly this one, leaves the block so the invalidated
+    code is not executed.
+    '''
+    if mode == POSITION_MODE and 0 <= parameter and parameter >> PAGE_BITS < MAX_DENSE_PAGES:
+        lines = [
+            f"address = {parameter}",
+            f"if owned[{parameter >> PAGE_BITS}]:",
+            f"    pages[{parameter >> PAGE_BITS}][{parameter & PAGE_MASK}] = {value}",
+        ]
+    elif mode in (POSITION_MODE, RELATIVE_MODE):
+        address = f"{parameter}" if mode == POSITION_MODE else f"rb + {parameter}"
+        lines = [
+            f"address = {address}",
+            f"if 0 <= address < extent and owned[address >> {PAGE_BITS}]:",
+            f"    pages[address >> {PAGE_BITS}][address & {PAGE_MASK}] = {value}",
+        ]
+    else:
+        raise ValueError(f"Cannot write with parameter mode {mode}")
+    return lines + [
+        "else:",
+        f"    memory[address] = {value}",
+        "if address in watched:",
+        "    program.invalidate_instructions(address)",
+    ] + ["    " + line for line in exit_block(next_ptr)]
+
+
+def suspend(ptr: int, full_opcode: int) -> List[str]:
+    return [
+        f"program.instruction_ptr = {ptr}",
+        "program.relative_base = rb",
+        "program.restore = True",
+        f"program.opcode_memory = {full_opcode}",
+        "return False",
+    ]
+
+
+def exit_block(next_ptr: int) -> List[str]:
+    return [
+        f"program.instruction_ptr = {next_ptr}",
+        "program.relative_base = rb",
+        "return False",
+    ]
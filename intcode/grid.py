@@ -0,0 +1,152 @@
+'''A growable two dimensional grid of tiles, for the screens and maps drawn by
+intcode programs.
+
+Cells are stored in a NumPy array indexed by (y, x), shifted by an origin so
+that coordinates may be negative, and grown by doubling whenever a write lands
+outside it. Unwritten cells read as the fill value. The bounds of all written
+cells, and the region written since the dirty region was last taken, are kept
+up to date on every write so that drawing never has to search for them.
+'''
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+import numpy as np
+
+Point = Tuple[int, int]
+# Inclusive min x, min y, max x, max y.
+Bounds = Tuple[int, int, int, int]
+ConversionTable = Union[Sequence[str], Dict[int, str], np.ndarray]
+
+INITIAL_SIZE = 16
+
+
+def lookup_table(conversion_table: ConversionTable) -> np.ndarray:
+    '''An array mapping tile values to characters.'''
+    if isinstance(conversion_table, dict):
+        table = np.full(max(conversion_table) + 1, ' ', dtype='<U1')
+        for value, char in conversion_table.items():
+            table[value] = char
+        return table
+    if isinstance(conversion_table, str):
+        return np.array(list(conversion_table))
+    return np.asarray(conversion_table)
+
+
+class Grid:
+
+    def __init__(self, fill: int=0, dtype=np.int64):
+        self.fill = fill
+        self.cells = np.full((INITIAL_SIZE, INITIAL_SIZE), fill, dtype=dtype)
+        # The coordinates of cells[0, 0].
+        self.origin_x = self.origin_y = -(INITIAL_SIZE // 2)
+        self.bounds: Optional[Bounds] = None
+        self.dirty: Optional[Bounds] = None
+
+    @classmethod
+    def from_dict(cls, tiles: Dict[Point, int], fill: int=0) -> 'Grid':
+        grid = cls(fill=fill)
+        for position, value in tiles.items():
+            grid[position] = value
+        return grid
+
+    @classmethod
+    def from_array(cls, cells: np.ndarray, min_x: int, min_y: int, fill: int=0) -> 'Grid':
+        '''A grid over a (y, x) array whose first cell is at (min_x, min_y).'''
+        grid = cls(fill=fill, dtype=cells.dtype)
+        grid.cells, grid.origin_x, grid.origin_y = cells, min_x, min_y
+        if cells.size:
+            grid.bounds = (min_x, min_y, min_x + cells.shape[1] - 1, min_y + cells.shape[0] - 1)
+        return grid
+
+    def __getitem__(self, position: Point) -> int:
+        row, column = position[1] - self.origin_y, position[0] - self.origin_x
+        if 0 <= row < self.cells.shape[0] and 0 <= column < self.cells.shape[1]:
+            return int(self.cells[row, column])
+        return self.fill
+
+    def __setitem__(self, position: Point, value: int) -> None:
+        x, y = position
+        row, column = y - self.origin_y, x - self.origin_x
+        if not (0 <= row < self.cells.shape[0] and 0 <= column < self.cells.shape[1]):
+            self.grow(x, y)
+            row, column = y - self.origin_y, x - self.origin_x
+        self.cells[row, column] = value
+        self.bounds = extend(self.bounds, x, y)
+        self.dirty = extend(self.dirty, x, y)
+
+    def __contains__(self, position: Point) -> bool:
+        return self[position] != self.fill
+
+    def grow(self, x: int, y: int) -> None:
+        '''Reallocate the cells to hold (x, y), at least doubling along each
+        axis that grows, with the spare room on the side that grew.'''
+        height, width = self.cells.shape
+        min_x, min_y = min(self.origin_x, x), min(self.origin_y, y)
+        max_x = max(self.origin_x + width - 1, x)
+        max_y = max(self.origin_y + height - 1, y)
+        new_width = width if max_x - min_x < width else max(2 * width, max_x - min_x + 1)
+        new_height = height if max_y - min_y < height else max(2 * height, max_y - min_y + 1)
+        if x < self.origin_x:
+            min_x = max_x - new_width + 1
+        if y < self.origin_y:
+            min_y = max_y - new_height + 1
+        cells = np.full((new_height, new_width), self.fill, dtype=self.cells.dtype)
+        row, column = self.origin_y - min_y, self.origin_x - min_x
+        cells[row : row + height, column : column + width] = self.cells
+        self.cells, self.origin_x, self.origin_y = cells, min_x, min_y
+
+    def take_dirty(self) -> Optional[Bounds]:
+        '''The region written since the last call, if any.'''
+        dirty, self.dirty = self.dirty, None
+        return dirty
+
+    def view(self, bounds: Optional[Bounds]=None) -> np.ndarray:
+        '''The cells within bounds, by default those of all written cells, as
+        a (y, x) array.'''
+        bounds = bounds if bounds is not None else self.bounds
+        if bounds is None:
+            return self.cells[:0, :0]
+        min_x, min_y, max_x, max_y = bounds
+        return self.cells[
+            min_y - self.origin_y : max_y - self.origin_y + 1,
+            min_x - self.origin_x : max_x - self.origin_x + 1]
+
+    def positions(self, *values: int) -> List[Point]:
+        '''The positions of all cells within bounds holding any of values.'''
+        if self.bounds is None:
+            return []
+        rows, columns = np.nonzero(np.isin(self.view(), values))
+        min_x, min_y = self.bounds[:2]
+        return list(zip((columns + min_x).tolist(), (rows + min_y).tolist()))
+
+    def count(self, *values: int) -> int:
+        '''The number of cells within bounds holding any of values, or not
+        holding the fill value if none are given.'''
+        if not values:
+            return int(np.count_nonzero(self.view() != self.fill))
+        return int(np.count_nonzero(np.isin(self.view(), values)))
+
+    def render(
+        self,
+        conversion_table: ConversionTable,
+        bounds: Optional[Bounds]=None,
+        flip: bool=False) -> np.ndarray:
+        '''The characters for the cells within bounds, by row. Rows run in
+        increasing y, or decreasing if flipped.'''
+        chars = lookup_table(conversion_table)[self.view(bounds)]
+        return chars[::-1] if flip else chars
+
+    def lines(
+        self,
+        conversion_table: ConversionTable,
+        bounds: Optional[Bounds]=None,
+        flip: bool=False) -> List[str]:
+        return [''.join(row) for row in self.render(conversion_table, bounds, flip).tolist()]
+
+
+def extend(bounds: Optional[Bounds], x: int, y: int) -> Bounds:
+    if bounds is None:
+        return (x, y, x, y)
+    min_x, min_y, max_x, max_y = bounds
+    if min_x <= x <= max_x and min_y <= y <= max_y:
+        return bounds
+    return (min(min_x, x), min(min_y, y), max(max_x, x), max(max_y, y))
+
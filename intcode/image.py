@@ -0,0 +1,135 @@
+'''A binary program image format with a memory mapped loader.
+
+An image is a fixed header followed by one little endian int64 per memory
+cell. Values that do not fit, or that collide with the escape value, are
+stored as the escape value in the cells and listed in a trailer of
+(address, length, signed little endian bytes) records. The header holds a
+CRC32 of everything after it.
+
+Images are memory mapped and their pages handed to a Program's memory without
+copying, pages only being copied once written. Loaded images, and parsed text
+programs, are cached so repeated loads of the same file are instant.
+
+    python -m intcode.image program.txt program.icim
+'''
+import mmap
+import os
+import struct
+import sys
+import zlib
+from typing import Dict, List, Sequence, Tuple
+
+from intcode.intcode import Program
+from intcode.memory import Memory, PAGE_SIZE
+
+MAGIC = b'ICIM'
+VERSION = 1
+# Magic, version, flags, number of cells, number of escaped values, checksum.
+HEADER = struct.Struct('<4sHHQII')
+CELL = struct.Struct('<q')
+ESCAPE_RECORD = struct.Struct('<QI')
+ESCAPE = -2**63
+INT64_MAX = 2**63 - 1
+
+# Pages of loaded files keyed by path, with the modification time and size
+# they were loaded at.
+IMAGE_CACHE: Dict[str, Tuple[Tuple[float, int], Sequence[Sequence[int]]]] = {}
+
+
+class ImageError(ValueError):
+    pass
+
+
+def write_image(code: List[int], f) -> None:
+    escaped = [(address, value) for address, value in enumerate(code)
+               if not ESCAPE < value <= INT64_MAX]
+    cells = struct.pack(f'<{len(code)}q', *(
+        value if ESCAPE < value <= INT64_MAX else ESCAPE for value in code))
+    trailer = b''.join(
+        ESCAPE_RECORD.pack(address, len(encoded)) + encoded
+        for address, encoded in (
+            (address, encode_big(value)) for address, value in escaped))
+    checksum = zlib.crc32(cells + trailer)
+    f.write(HEADER.pack(MAGIC, VERSION, 0, len(code), len(escaped), checksum))
+    f.write(cells)
+    f.write(trailer)
+
+
+def encode_big(value: int) -> bytes:
+    return value.to_bytes((value.bit_length() + 8) // 8, 'little', signed=True)
+
+
+def convert(text_path: str, image_path: str) -> None:
+    '''Convert a comma separated text program into an image.'''
+    with open(text_path) as f:
+        code = [int(x) for x in f.read().strip().split(',')]
+    with open(image_path, 'wb') as f:
+        write_image(code, f)
+
+
+def read_pages(path: str, verify: bool=True) -> Sequence[Sequence[int]]:
+    '''Map an image and split it into memory pages.
+
+    Full pages are views onto the mapped file. The final partial page, and any
+    page holding escaped values, are materialized as lists.
+    '''
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size < HEADER.size:
+            raise ImageError(f"{path} is too short to be an image.")
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, version, _, n_cells, n_escaped, checksum = HEADER.unpack_from(mapped)
+    if magic != MAGIC or version != VERSION:
+        raise ImageError(f"{path} is not a version {VERSION} image.")
+    end = HEADER.size + n_cells * CELL.size
+    if verify and zlib.crc32(memoryview(mapped)[HEADER.size:]) != checksum:
+        raise ImageError(f"Checksum mismatch in {path}.")
+    cells: Sequence[int] = memoryview(mapped)[HEADER.size:end]
+    if sys.byteorder == 'little':
+        cells = cells.cast('q')  # type: ignore
+    else:
+        cells = list(struct.unpack_from(f'<{n_cells}q', mapped, HEADER.size))
+    pages: List[Sequence[int]] = [
+        cells[start : start + PAGE_SIZE] for start in range(0, n_cells, PAGE_SIZE)]
+    if n_cells % PAGE_SIZE:
+        pages[-1] = list(pages[-1]) + [0] * (PAGE_SIZE - n_cells % PAGE_SIZE)
+    offset = end
+    for _ in range(n_escaped):
+        address, length = ESCAPE_RECORD.unpack_from(mapped, offset)
+        offset += ESCAPE_RECORD.size
+        value = int.from_bytes(mapped[offset : offset + length], 'little', signed=True)
+        offset += length
+        page = pages[address // PAGE_SIZE] = list(pages[address // PAGE_SIZE])
+        page[address % PAGE_SIZE] = value
+    return pages
+
+
+def read_text_pages(path: str) -> Sequence[Sequence[int]]:
+    with open(path) as f:
+        code = [int(x) for x in f.read().strip().split(',')]
+    code += [0] * (-len(code) % PAGE_SIZE)
+    return [code[start : start + PAGE_SIZE] for start in range(0, len(code), PAGE_SIZE)]
+
+
+def load_pages(path: str) -> Sequence[Sequence[int]]:
+    '''Pages of an image or text program, cached until the file changes.'''
+    stat = os.stat(path)
+    key = (stat.st_mtime, stat.st_size)
+    cached = IMAGE_CACHE.get(path)
+    if cached and cached[0] == key:
+        return cached[1]
+    with open(path, 'rb') as f:
+        is_image = f.read(len(MAGIC)) == MAGIC
+    pages = read_pages(path) if is_image else read_text_pages(path)
+    IMAGE_CACHE[path] = (key, pages)
+    return pages
+
+
+def load_program(path: str, **kwargs) -> Program:
+    '''Load an image or text program, sharing its pages copy on write.'''
+    program = Program([], **kwargs)
+    program.memory = Memory.from_pages(load_pages(path), limit=program.memory.limit)
+    return program
+
+
+if __name__ == '__main__':
+    convert(sys.argv[1], sys.argv[2])
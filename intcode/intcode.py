@@ -1,4 +1,18 @@
-from typing import Tuple, List, Optional, Callable, IO, Union, overload
+import copy
+from time import perf_counter
+from typing import (
+    Tuple, List, Dict, Set, Optional, Callable, IO, Iterable, Iterator, Sequence,
+    Union, NamedTuple, TYPE_CHECKING, overload)
+
+from intcode.channel import Channel
+from intcode.matchers import (
+    OutputMatcher, OutputCount, SuffixMatcher, PredicateMatcher)
+from intcode.memory import Memory
+
+if TYPE_CHECKING:
+    from intcode.checkpoint import Checkpointer
+    from intcode.compiler import CompiledBlock
+    from intcode.profiler import Profiler
 
 # You need to make relative opcode writes work.
 
@@ -18,19 +32,75 @@ EQUALS_OPCODE = 8
 ADJUST_RELATIVE_BASE_OPCODE = 9
 HALT_OP_CODE = 99
 
+# The largest number of parameters taken by any opcode.
+MAX_ARITY = 3
+
+# Execution engines.
+INTERPRETER_ENGINE = 'interpreter'
+COMPILED_ENGINE = 'compiled'
+
+
+class RunHook:
+    '''Observes a program's runs.
+
+    Profilers and checkpointers are hooks. Every engine's run loop reports
+    each interpreted instruction, each compiled block and each suspension to
+    all of a program's hooks, so any of them may be enabled together.
+    '''
+
+    def started(self, program: 'Program') -> None:
+        pass
+
+    def stopped(self, program: 'Program') -> None:
+        pass
+
+    def stepped(
+        self,
+        program: 'Program',
+        ptr: int,
+        relative_base: int,
+        instruction: 'Instruction',
+        elapsed: float) -> None:
+        pass
+
+    def ran_block(self, program: 'Program', ptr: int, n_instructions: int) -> None:
+        pass
+
+    def suspended(self, program: 'Program') -> None:
+        pass
+
 
 class Program:
 
-    def __init__(self, code: List[int], input: Optional[List[int]]=None):
-        self.code = code + [0] * 10000
-        self.input = input if input else []
-        self.output: List[int] = []
+    def __init__(
+        self,
+        code: List[int],
+        input: Optional[Iterable[int]]=None,
+        memory_limit: Optional[int]=None,
+        output_capacity: Optional[int]=None,
+        output_sink: Optional[Callable[[int], None]]=None):
+        self.memory = Memory(code, limit=memory_limit)
+        # Input is consumed first in first out.
+        self.input = Channel(input if input else [])
+        self.output = Channel(capacity=output_capacity, sink=output_sink)
         self.instruction_ptr = 0
         self.relative_base = 0
         # Flag for if program is in restored state, entered upon breaking for input.
         self.restore = False
         # Memory slot for an opcode from an input call.
         self.opcode_memory: Optional[int] = None
+        # Decoded instructions keyed by instruction pointer, and the set of
+        # memory addresses spanned by any cached instruction.
+        self.instruction_cache: Dict[int, 'Instruction'] = {}
+        self.cached_addresses: Set[int] = set()
+        # Basic blocks compiled by the compiled engine, keyed by start address,
+        # the starts of the blocks spanning each address, and addresses of
+        # blocks that were modified after compilation and are now interpreted.
+        self.compiled_blocks: Dict[int, 'CompiledBlock'] = {}
+        self.block_addresses: Dict[int, Tuple[int, ...]] = {}
+        self.interpreted_addresses: Set[int] = set()
+        self.profiler: Optional['Profiler'] = None
+        self.checkpointer: Optional['Checkpointer'] = None
     
     @overload
     def __getitem__(self, idxr: int) -> int:
@@ -41,19 +111,114 @@ class Program:
         pass
 
     def __getitem__(self, idxr):
-        return self.code[idxr]
+        return self.memory[idxr]
     
     def __setitem__(self, idxr, val) -> None:
-        self.code[idxr] = val
+        self.memory[idxr] = val
+        if isinstance(idxr, slice):
+            self.clear_instruction_cache()
+        elif idxr in self.cached_addresses:
+            self.invalidate_instructions(idxr)
     
     def get_opcode(self) -> int:
         return self[self.instruction_ptr]
     
+    def cache_instruction(self, ptr: int, instruction: 'Instruction') -> None:
+        self.instruction_cache[ptr] = instruction
+        self.cached_addresses.update(
+            range(ptr, ptr + len(instruction.parameters) + 1))
+
+    def invalidate_instructions(self, address: int) -> None:
+        '''Drop any cached instruction or compiled block spanning address.
+
+        Instructions are at most MAX_ARITY + 1 cells long, so only the few
+        pointers just before the written address need checking. Stale entries
+        in cached_addresses are harmless, they only cost a re-check. Modified
+        compiled blocks are not recompiled, their addresses fall back to the
+        interpreter.
+        '''
+        for ptr in range(address - MAX_ARITY, address + 1):
+            instruction = self.instruction_cache.get(ptr)
+            if instruction and ptr + len(instruction.parameters) >= address:
+                del self.instruction_cache[ptr]
+        for start in self.block_addresses.pop(address, ()):
+            block = self.compiled_blocks.pop(start, None)
+            if block:
+                self.interpreted_addresses.update(range(start, block.end))
+
+    def clear_instruction_cache(self) -> None:
+        self.instruction_cache.clear()
+        self.cached_addresses.clear()
+        self.compiled_blocks.clear()
+        self.block_addresses.clear()
+
+    def enable_profiling(self) -> 'Profiler':
+        '''Start profiling this program's runs, and any forks taken after.'''
+        from intcode.profiler import Profiler
+        if not self.profiler:
+            self.profiler = Profiler()
+        return self.profiler
+
+    def enable_checkpoints(
+        self,
+        path: str,
+        every: int,
+        payload: Optional[Callable[[], object]]=None) -> 'Checkpointer':
+        '''Save this program's state to path every so many instructions run,
+        along with whatever payload returns at the time.'''
+        from intcode.checkpoint import Checkpointer
+        self.checkpointer = Checkpointer(path, every, payload)
+        return self.checkpointer
+
+    @property
+    def hooks(self) -> List[RunHook]:
+        return [hook for hook in (self.profiler, self.checkpointer) if hook is not None]
+
+    def record_input(self) -> List[int]:
+        '''Start logging every input value given to this program, for replay.'''
+        if self.input.log is None:
+            self.input.log = []
+        return self.input.log
+
+    def fork(self) -> 'Program':
+        '''A copy of this program in its current state.
+
+        Memory pages are shared copy on write, so forking only costs the
+        pages either program goes on to modify. Decoded instructions and
+        compiled blocks are shared as well. Forks do not inherit checkpointing,
+        so they never overwrite this program's checkpoints.
+        '''
+        program = copy.copy(self)
+        program.checkpointer = None
+        program.memory = self.memory.fork()
+        program.input = self.input.copy()
+        program.output = self.output.copy()
+        program.instruction_cache = self.instruction_cache.copy()
+        program.cached_addresses = self.cached_addresses.copy()
+        program.compiled_blocks = self.compiled_blocks.copy()
+        program.block_addresses = self.block_addresses.copy()
+        program.interpreted_addresses = self.interpreted_addresses.copy()
+        return program
+
+    def snapshot(self) -> 'Program':
+        '''Capture the current state, to later be passed to restore_snapshot.
+
+        A snapshot is just a fork that is never run.
+        '''
+        return self.fork()
+
+    def restore_snapshot(self, snapshot: 'Program') -> None:
+        # Fork the snapshot again so it can be restored more than once.
+        checkpointer = self.checkpointer
+        self.__dict__.update(snapshot.fork().__dict__)
+        self.checkpointer = checkpointer
+
     def reset_output(self) -> None:
-        self.output = []
+        self.output.clear()
     
     def add_input(self, *inputs) -> None:
-        self.input.extend(inputs)
+        for value in inputs:
+            self.input.put(value)
     
     @classmethod
     def from_file(cls, f: IO) -> 'Program':
@@ -70,49 +235,149 @@ OpCodeParameterModes = List[int]
 InstructionPointer = int
 DoHalt = bool
 OpcodeReturn = Tuple[Program, DoHalt]
-
-
-
-def run_until_predicate(program: Program, predicate: Callable[[List[int]], bool]) -> Tuple[Program, bool]:
-    halt = False
-    while not (halt or predicate(program.output)):
-        if not program.restore:
-            full_opcode = program.get_opcode()
-        # If we are returning from a suspension after asking for input, we need
-        # to restore the prior state to know what to do with the input.
+Operation = Callable[[Program, OpCodeParameters, OpCodeParameterModes], OpcodeReturn]
+
+
+class Instruction(NamedTuple):
+    opcode: OpCode
+    operation: Operation
+    parameters: OpCodeParameters
+    parameter_modes: OpCodeParameterModes
+
+
+
+def run_until_predicate(
+    program: Program,
+    predicate: Union[Callable[[Channel], bool], OutputMatcher],
+    engine: str=INTERPRETER_ENGINE) -> Tuple[Program, bool]:
+    '''Run the program until the predicate holds on its output.
+
+    The predicate is only evaluated when output is produced. It is either an
+    OutputMatcher, fed each output value, or a function of the whole output.
+    '''
+    matcher = predicate if isinstance(predicate, OutputMatcher) else PredicateMatcher(predicate)
+    matcher.start(program.output)
+    listener, program.output.listener = program.output.listener, matcher.update
+    hooks: List[RunHook] = []
+    try:
+        if engine not in (INTERPRETER_ENGINE, COMPILED_ENGINE):
+            raise ValueError(f"Unknown engine {engine}.")
+        hooks = program.hooks
+        for hook in hooks:
+            hook.started(program)
+        if engine == COMPILED_ENGINE:
+            # Imported here since it builds on this module.
+            from intcode.compiler import run_compiled
+            return run_compiled(program, matcher, hooks)
+        halt = False
+        while not (halt or matcher.matched):
+            program, halt = hooked_step(program, hooks) if hooks else step(program)
+            if program.restore:
+                break
+        return program, halt
+    finally:
+        for hook in hooks:
+            hook.stopped(program)
+        program.output.listener = listener
+
+def step(program: Program) -> Tuple[Program, bool]:
+    '''Interpret a single instruction.
+
+    If the instruction needs input that is not yet available, or would output
+    to a full channel, the program is suspended instead, which is signaled by
+    the restore flag being set.
+    '''
+    if not program.restore:
+        instruction = program.instruction_cache.get(program.instruction_ptr)
+        if instruction is None:
+            instruction = decode_instruction(program, program.get_opcode())
+    # If we are returning from a suspension after asking for input, we need
+    # to restore the prior state to know what to do with the input.
+    else:
+        full_opcode, program.opcode_memory = program.opcode_memory, None
+        program.restore = False
+        instruction = decode_instruction(program, full_opcode)
+    # If we hit an input opcode but don't yet have any input, or an output
+    # opcode with no room for output, break out and set a restore state flag
+    # + remember the current opcode.
+    if ((instruction.opcode == INPUT_OPCODE and not program.input)
+        or (instruction.opcode == OUTPUT_OPCODE and program.output.full())):
+        program.restore = True
+        program.opcode_memory = program.get_opcode()
+        return program, False
+    return instruction.operation(
+        program, instruction.parameters, instruction.parameter_modes)
+
+def hooked_step(program: Program, hooks: Sequence[RunHook]) -> Tuple[Program, bool]:
+    '''Interpret a single instruction as step does, reporting it to hooks.'''
+    ptr, relative_base = program.instruction_ptr, program.relative_base
+    instruction = program.instruction_cache.get(ptr)
+    if instruction is None:
+        instruction = decode_instruction(
+            program, program.opcode_memory if program.restore else program.get_opcode())
+    start = perf_counter()
+    program, halt = step(program)
+    elapsed = perf_counter() - start
+    for hook in hooks:
+        if program.restore:
+            hook.suspended(program)
         else:
-            full_opcode, program.opcode_memory = program.opcode_memory, None
-            program.restore = False
-        opcode, parameter_modes = parse_opcode(full_opcode)
-        # If we hit an input opcode but don't yet have any input, break out and
-        # set a restore state flag + remember the current opcode.
-        if opcode == INPUT_OPCODE and not program.input:
-            program.restore = True
-            program.opcode_memory = full_opcode
-            return program, halt
-        operation, n_parameters = OP_CODE_TABLE[opcode]
-        # Add inferred parameter modes of zero.
-        if len(parameter_modes) != n_parameters:
-            parameter_modes = parameter_modes + [0]*(n_parameters - len(parameter_modes))
-        parameters: List[int] = program[program.instruction_ptr + 1 : program.instruction_ptr + n_parameters + 1]
-        program, halt = operation(program, parameters, parameter_modes)
+            hook.stepped(program, ptr, relative_base, instruction, elapsed)
     return program, halt
 
-def run(program: Program) -> Tuple[Program, int]:
-    return run_until_predicate(program, lambda x: False)
+def run(program: Program, engine: str=INTERPRETER_ENGINE) -> Tuple[Program, int]:
+    return run_until_predicate(program, OutputMatcher(), engine=engine)
+
+def run_until_output(
+    program: Program,
+    output_len: int=1,
+    engine: str=INTERPRETER_ENGINE) -> Tuple[Program, bool]:
+    return run_until_predicate(program, OutputCount(output_len), engine=engine)
 
-def run_until_output(program: Program, output_len: int=1) -> Tuple[Program, bool]:
-    predicate = lambda x: len(x) >= output_len
-    return run_until_predicate(program, predicate)
+def run_until_matches(
+    program: Program,
+    outseq: List[int],
+    engine: str=INTERPRETER_ENGINE) -> Tuple[Program, bool]:
+    return run_until_predicate(program, SuffixMatcher(outseq), engine=engine)
 
-def run_until_matches(program: Program, outseq: List[int]) -> Tuple[Program, bool]:
-    predicate = lambda x: len(x) >= len(outseq) and x[-len(outseq):] == outseq
-    return run_until_predicate(program, predicate)
+def iter_output(program: Program, engine: str=INTERPRETER_ENGINE) -> Iterator[int]:
+    '''Run the program, yielding its output as it is produced.
+
+    Output is taken off the channel as it is yielded, so it never accumulates.
+    Iteration stops when the program halts or suspends for input.
+    '''
+    halt = False
+    while not halt:
+        _, halt = run_until_output(program, engine=engine)
+        if not program.output:
+            return
+        while program.output:
+            yield program.output.popleft()
 
 def parse_opcode(full_opcode: OpCode) -> Tuple[OpCode, OpCodeParameterModes]:
     s = str(full_opcode)
     return int(s[-2:]), [int(c) for c in reversed(s[:-2])]
 
+def decode_instruction(program: Program, full_opcode: OpCode) -> Instruction:
+    '''Decode the instruction at the current instruction pointer and cache it.
+
+    The cached entry is dropped by the program whenever a write lands inside
+    the instruction, so self modifying code is decoded afresh. An opcode
+    restored after an input suspension is only cached if it still matches
+    memory.
+    '''
+    opcode, parameter_modes = parse_opcode(full_opcode)
+    operation, n_parameters = OP_CODE_TABLE[opcode]
+    # Add inferred parameter modes of zero.
+    if len(parameter_modes) != n_parameters:
+        parameter_modes = parameter_modes + [0]*(n_parameters - len(parameter_modes))
+    ptr = program.instruction_ptr
+    parameters: List[int] = program[ptr + 1 : ptr + n_parameters + 1]
+    instruction = Instruction(opcode, operation, parameters, parameter_modes)
+    if full_opcode == program[ptr]:
+        program.cache_instruction(ptr, instruction)
+    return instruction
+
 def lookup_parameters(
     program: Program, 
     parameters: OpCodeParameters, 
@@ -124,11 +389,11 @@ def lookup_parameters(
 
 def lookup_parameter(program: Program, parameter: int, mode: int) -> int:
     if mode == POSITION_MODE:
-        return program[parameter]
+        return program.memory[parameter]
     elif mode == IMMEDIATE_MODE:
         return parameter
     elif mode == RELATIVE_MODE:
-        return program[program.relative_base + parameter]
+        return program.memory[program.relative_base + parameter]
     else:
         raise ValueError(f"Unknown parameter mode {mode}.")
 
@@ -168,7 +433,7 @@ def input_(
     program: Program, 
     parameters: OpCodeParameters, 
     parameter_modes: OpCodeParameterModes) -> OpcodeReturn:
-    value = program.input.pop()
+    value = program.input.popleft()
     write_to_memory(program, value, parameters[0], parameter_modes[0])
     increase_instruction_pointer(program, parameters)
     return program, False
@@ -178,7 +443,7 @@ def output(
     parameters: OpCodeParameters, 
     parameter_modes: OpCodeParameterModes) -> OpcodeReturn:
     parameter = lookup_parameter(program, parameters[0], parameter_modes[0])
-    program.output.append(parameter)
+    program.output.put(parameter)
     increase_instruction_pointer(program, parameters)
     return program, False
 
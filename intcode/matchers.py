@@ -0,0 +1,130 @@
+'''Incremental predicates over program output.
+
+A matcher is fed each output value as the program produces it, and signals
+through its matched flag that the run should stop. Each matcher does a constant
+amount of work per value, so runs do not rescan the output after every
+instruction.
+'''
+from typing import Callable, Dict, List, Sequence
+
+LINE_END = 10
+
+
+class OutputMatcher:
+    '''Base for matchers, which on its own never matches.'''
+
+    def __init__(self) -> None:
+        self.matched = False
+
+    def start(self, output: Sequence[int]) -> None:
+        '''Prepare for a run, given the output already buffered.'''
+        self.matched = False
+        for value in output:
+            self.update(value)
+
+    def update(self, value: int) -> None:
+        pass
+
+
+class OutputCount(OutputMatcher):
+    '''Match once the output holds at least n values.'''
+
+    def __init__(self, n: int) -> None:
+        super().__init__()
+        self.n = n
+        self.count = 0
+
+    def start(self, output: Sequence[int]) -> None:
+        self.count = len(output)
+        self.matched = self.count >= self.n
+
+    def update(self, value: int) -> None:
+        self.count += 1
+        if self.count >= self.n:
+            self.matched = True
+
+
+class SuffixMatcher(OutputMatcher):
+    '''Match once the output ends with a given sequence.
+
+    The pattern is compiled into a KMP automaton with a full transition table
+    over the values occurring in it, so each output value is a single lookup.
+    '''
+
+    def __init__(self, pattern: Sequence[int]) -> None:
+        super().__init__()
+        self.pattern = list(pattern)
+        self.transitions = build_transitions(self.pattern)
+        self.state = 0
+
+    def start(self, output: Sequence[int]) -> None:
+        self.state = 0
+        self.matched = not self.pattern
+        # Only the tail of the output can take part in a match.
+        for value in list(output)[-len(self.pattern):] if self.pattern else []:
+            self.update(value)
+
+    def update(self, value: int) -> None:
+        self.state = self.transitions[self.state].get(value, 0)
+        # Only the most recent value decides whether the output ends with the
+        # pattern, so this is reset on every update.
+        self.matched = self.state == len(self.pattern)
+
+
+class LineReader(OutputMatcher):
+    '''Match once a full line of output has been read.
+
+    The most recently completed line, without its line end, is kept in line.
+    '''
+
+    def __init__(self, line_end: int=LINE_END) -> None:
+        super().__init__()
+        self.line_end = line_end
+        self.line: List[int] = []
+        self.current: List[int] = []
+
+    def start(self, output: Sequence[int]) -> None:
+        self.current = []
+        super().start(output)
+
+    def update(self, value: int) -> None:
+        if value == self.line_end:
+            self.line, self.current = self.current, []
+            self.matched = True
+        else:
+            self.current.append(value)
+
+
+class PredicateMatcher(OutputMatcher):
+    '''Adapt a predicate over the whole output, evaluated on output events.'''
+
+    def __init__(self, predicate: Callable[[Sequence[int]], bool]) -> None:
+        super().__init__()
+        self.predicate = predicate
+        self.output: Sequence[int] = []
+
+    def start(self, output: Sequence[int]) -> None:
+        self.output = output
+        self.matched = self.predicate(output)
+
+    def update(self, value: int) -> None:
+        self.matched = self.predicate(self.output)
+
+
+def build_transitions(pattern: Sequence[int]) -> List[Dict[int, int]]:
+    '''The KMP automaton for pattern, a transition dict for each state.
+
+    Values missing from a state's dict lead back to the start state.
+    '''
+    transitions: List[Dict[int, int]] = [{} for _ in range(len(pattern) + 1)]
+    if not pattern:
+        return transitions
+    transitions[0][pattern[0]] = 1
+    # The state reached on the longest proper border of the matched prefix.
+    fallback = 0
+    for state in range(1, len(pattern) + 1):
+        transitions[state] = dict(transitions[fallback])
+        if state < len(pattern):
+            transitions[state][pattern[state]] = state + 1
+            fallback = transitions[fallback].get(pattern[state], 0)
+    return transitions
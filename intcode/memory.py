@@ -0,0 +1,156 @@
+'''Growable memory for intcode programs.
+
+Memory is split into fixed size pages. The loaded image fills the first pages,
+pages past it are only allocated once they are written to, and addresses
+beyond the dense region live in a sparse overlay. Unwritten memory reads as
+zero, and an optional limit bounds the addresses that may be written. Pages
+can be shared between forked memories and are copied on write.
+'''
+import copy
+from typing import Dict, List, Optional, Sequence, overload
+
+PAGE_BITS = 8
+PAGE_SIZE = 1 << PAGE_BITS
+PAGE_MASK = PAGE_SIZE - 1
+# Addresses past this many pages are stored in the sparse overlay.
+MAX_DENSE_PAGES = 4096
+
+Page = List[int]
+
+# Shared by all memories for pages that have never been written.
+ZERO_PAGE: Page = [0] * PAGE_SIZE
+
+
+class Memory:
+
+    def __init__(self, image: List[int], limit: Optional[int]=None):
+        if limit is not None and len(image) > limit:
+            raise MemoryError(f"Image of size {len(image)} exceeds memory limit {limit}.")
+        self.pages: List[Page] = [
+            image[start : start + PAGE_SIZE] for start in range(0, len(image), PAGE_SIZE)]
+        if self.pages:
+            self.pages[-1].extend([0] * (PAGE_SIZE - len(self.pages[-1])))
+        # Pages may only be written in place if owned, anything else is shared.
+        self.owned: List[bool] = [True] * len(self.pages)
+        self.overlay: Dict[int, int] = {}
+        # Writes to owned pages are never checked, so the limit is rounded up
+        # to a whole page.
+        if limit is not None:
+            limit = -(-limit // PAGE_SIZE) * PAGE_SIZE
+        self.limit = limit
+        # The number of memory cells allocated, and the most ever allocated.
+        self.footprint = len(self.pages) * PAGE_SIZE
+        self.peak_footprint = self.footprint
+
+    @overload
+    def __getitem__(self, address: int) -> int:
+        pass
+
+    @overload
+    def __getitem__(self, address: slice) -> List[int]:
+        pass
+
+    def __getitem__(self, address):
+        if isinstance(address, slice):
+            return self.read_slice(address)
+        if address < 0:
+            raise IndexError(f"Negative memory address {address}.")
+        try:
+            return self.pages[address >> PAGE_BITS][address & PAGE_MASK]
+        except IndexError:
+            return self.overlay.get(address, 0)
+
+    def __setitem__(self, address, value) -> None:
+        if isinstance(address, slice):
+            for a, v in zip(self.slice_range(address), value):
+                self[a] = v
+            return
+        if address < 0:
+            raise IndexError(f"Negative memory address {address}.")
+        page = address >> PAGE_BITS
+        if page < len(self.owned) and self.owned[page]:
+            self.pages[page][address & PAGE_MASK] = value
+        else:
+            self.write_unowned(address, value)
+
+    def __len__(self) -> int:
+        return len(self.pages) * PAGE_SIZE
+
+    @classmethod
+    def from_pages(cls, pages: Sequence[Sequence[int]], limit: Optional[int]=None) -> 'Memory':
+        '''A memory over existing full size pages, shared copy on write.
+
+        Pages may be any indexable sequence, such as views onto a mapped
+        image, since they are copied into lists before being written.
+        '''
+        memory = cls([], limit=limit)
+        memory.pages = list(pages)  # type: ignore
+        memory.owned = [False] * len(memory.pages)
+        return memory
+
+    def fork(self) -> 'Memory':
+        '''A copy of this memory sharing all pages copy on write.
+
+        Pages become shared with the fork in this memory as well, and are
+        copied by whichever memory writes to them first.
+        '''
+        # Mutated in place since compiled blocks hold on to the owned list.
+        self.owned[:] = [False] * len(self.owned)
+        self.footprint = len(self.overlay)
+        memory = copy.copy(self)
+        memory.pages = self.pages[:]
+        memory.owned = self.owned[:]
+        memory.overlay = self.overlay.copy()
+        memory.peak_footprint = memory.footprint
+        return memory
+
+    def read_slice(self, idxr: slice) -> List[int]:
+        addresses = self.slice_range(idxr)
+        if addresses.step != 1 or not 0 <= addresses.start <= addresses.stop <= len(self):
+            return [self[a] for a in addresses]
+        # Contiguous reads from the dense region are stitched together from
+        # page slices.
+        values: List[int] = []
+        start, stop = addresses.start, addresses.stop
+        while start < stop:
+            page, offset = start >> PAGE_BITS, start & PAGE_MASK
+            n = min(PAGE_SIZE - offset, stop - start)
+            values.extend(self.pages[page][offset : offset + n])
+            start += n
+        return values
+
+    def slice_range(self, idxr: slice) -> range:
+        stop = len(self) if idxr.stop is None else idxr.stop
+        return range(idxr.start or 0, stop, idxr.step or 1)
+
+    def write_unowned(self, address: int, value: int) -> None:
+        '''Slow path for writes that need to allocate or copy a page first.'''
+        self.check_limit(address)
+        page = address >> PAGE_BITS
+        if page >= MAX_DENSE_PAGES:
+            if address not in self.overlay:
+                self.footprint += 1
+            self.overlay[address] = value
+        else:
+            self.reserve(address)
+            self.pages[page] = list(self.pages[page])
+            self.owned[page] = True
+            self.pages[page][address & PAGE_MASK] = value
+            self.footprint += PAGE_SIZE
+        self.peak_footprint = max(self.peak_footprint, self.footprint)
+
+    def check_limit(self, address: int) -> None:
+        if self.limit is not None and address >= self.limit:
+            raise IndexError(f"Memory address {address} exceeds limit {self.limit}.")
+
+    def reserve(self, address: int) -> None:
+        '''Extend the dense region with zero pages up to address.
+
+        Reserved pages are shared and cost nothing until written. Pages are
+        only ever appended in place, so references to the page lists stay
+        valid.
+        '''
+        n_pages = min(address >> PAGE_BITS, MAX_DENSE_PAGES - 1) + 1
+        while len(self.pages) < n_pages:
+            self.pages.append(ZERO_PAGE)
+            self.owned.append(False)
@@ -0,0 +1,142 @@
+'''Networks of intcode programs running as asyncio coroutines.
+
+Each program in a network runs until it halts or suspends for input, forwards
+its output to the inboxes of the programs it is connected to, then awaits its
+own inbox. Programs are only scheduled when input is actually available, and
+a network stops once every program has halted or is waiting on an empty
+inbox.
+'''
+import asyncio
+from collections import deque
+from typing import Deque, Dict, Hashable, Iterable, List, Tuple
+
+from intcode.intcode import Program, run, INTERPRETER_ENGINE
+
+Name = Hashable
+
+
+class Network:
+
+    def __init__(self, engine: str=INTERPRETER_ENGINE):
+        self.engine = engine
+        self.programs: Dict[Name, Program] = {}
+        # Values sent between runs. Queues are bound to the event loop that
+        # uses them, so each run moves these into queues of its own.
+        self.inboxes: Dict[Name, Deque[int]] = {}
+        self.queues: Dict[Name, asyncio.Queue] = {}
+        self.connections: Dict[Name, List[Name]] = {}
+        self.halted: Dict[Name, bool] = {}
+        self.n_running = 0
+        self.n_waiting = 0
+
+    def add(self, name: Name, program: Program) -> None:
+        self.programs[name] = program
+        self.inboxes[name] = deque()
+        self.connections[name] = []
+        self.halted[name] = False
+
+    def connect(self, source: Name, destination: Name) -> None:
+        '''Send all output of source to destination.
+
+        Programs with no outgoing connections keep their output.
+        '''
+        self.connections[source].append(destination)
+
+    def send(self, name: Name, *values: int) -> None:
+        if self.queues:
+            for value in values:
+                self.queues[name].put_nowait(value)
+        else:
+            self.inboxes[name].extend(values)
+
+    def pending(self, name: Name) -> List[int]:
+        '''Values sent to a program that it has not consumed.'''
+        return list(self.inboxes[name])
+
+    def run(self) -> Dict[Name, Program]:
+        return asyncio.run(self.run_async())
+
+    async def run_async(self) -> Dict[Name, Program]:
+        for name, inbox in self.inboxes.items():
+            self.queues[name] = asyncio.Queue()
+            while inbox:
+                self.queues[name].put_nowait(inbox.popleft())
+        self.n_running = sum(not halted for halted in self.halted.values())
+        self.n_waiting = 0
+        self.idle = asyncio.Event()
+        finished = asyncio.gather(*(self.run_program(name) for name in self.programs))
+        idle = asyncio.ensure_future(self.idle.wait())
+        await asyncio.wait([finished, idle], return_when=asyncio.FIRST_COMPLETED)
+        idle.cancel()
+        # Programs still waiting for input are left suspended, so the network
+        # can be run again after sending more input.
+        finished.cancel()
+        try:
+            await finished
+        except asyncio.CancelledError:
+            pass
+        for name, queue in self.queues.items():
+            while not queue.empty():
+                self.inboxes[name].append(queue.get_nowait())
+        self.queues = {}
+        return self.programs
+
+    async def run_program(self, name: Name) -> None:
+        program, inbox = self.programs[name], self.queues[name]
+        while True:
+            _, halt = run(program, engine=self.engine)
+            if self.connections[name]:
+                while program.output:
+                    value = program.output.popleft()
+                    for destination in self.connections[name]:
+                        self.queues[destination].put_nowait(value)
+            if halt:
+                self.halted[name] = True
+                self.n_running -= 1
+                self.check_idle()
+                return
+            self.n_waiting += 1
+            self.check_idle()
+            value = await inbox.get()
+            self.n_waiting -= 1
+            program.add_input(value)
+            while not inbox.empty():
+                program.add_input(inbox.get_nowait())
+
+    def check_idle(self) -> None:
+        '''Signal the network to stop once no program can make progress.'''
+        if self.n_waiting == self.n_running and all(
+                queue.empty() for name, queue in self.queues.items()
+                if not self.halted[name]):
+            self.idle.set()
+
+
+def pipeline(programs: Iterable[Program], engine: str=INTERPRETER_ENGINE) -> Network:
+    '''Connect programs in a chain, named by their position.'''
+    network = Network(engine=engine)
+    programs = list(programs)
+    for i, program in enumerate(programs):
+        network.add(i, program)
+    for i in range(len(programs) - 1):
+        network.connect(i, i + 1)
+    return network
+
+
+def ring(programs: Iterable[Program], engine: str=INTERPRETER_ENGINE) -> Network:
+    '''Connect programs in a feedback loop, named by their position.'''
+    network = pipeline(programs, engine=engine)
+    if network.programs:
+        network.connect(len(network.programs) - 1, 0)
+    return network
+
+
+def graph(
+    programs: Dict[Name, Program],
+    edges: Iterable[Tuple[Name, Name]],
+    engine: str=INTERPRETER_ENGINE) -> Network:
+    network = Network(engine=engine)
+    for name, program in programs.items():
+        network.add(name, program)
+    for source, destination in edges:
+        network.connect(source, destination)
+    return network
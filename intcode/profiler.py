@@ -0,0 +1,121 @@
+'''Instruction level profiling for intcode programs.
+
+Profiling is opt in, through Program.enable_profiling, and the profiler is a
+RunHook, so it is driven by the usual run loops alongside any other hooks such
+as a checkpointer. The interpreter is profiled per instruction. The compiled engine is profiled per block, with instruction
+counts taken from block lengths, so they are approximate for blocks left early
+on a write to code.
+'''
+import csv
+import json
+from collections import Counter
+from time import perf_counter
+from typing import Dict, IO, List, Tuple
+
+from intcode.intcode import (
+    Program, Instruction, RunHook,
+    POSITION_MODE, RELATIVE_MODE,
+    ADD_OP_CODE, MULTIPLY_OP_CODE, INPUT_OPCODE, LESS_THAN_OPCODE, EQUALS_OPCODE)
+
+# Opcodes whose final parameter is an address written to.
+WRITE_OPCODES = {ADD_OP_CODE, MULTIPLY_OP_CODE, INPUT_OPCODE, LESS_THAN_OPCODE, EQUALS_OPCODE}
+
+
+class Profiler(RunHook):
+
+    def __init__(self) -> None:
+        self.instructions = 0
+        self.elapsed = 0.0
+        self.opcode_counts: Counter = Counter()
+        self.opcode_times: Dict[int, float] = Counter()
+        # Hits on instruction pointers, or block starts for the compiled engine.
+        self.address_hits: Counter = Counter()
+        self.memory_reads: Counter = Counter()
+        self.memory_writes: Counter = Counter()
+        # Suspensions for input, or for room on a full output channel.
+        self.suspensions = 0
+        self.run_start = 0.0
+
+    @property
+    def instructions_per_second(self) -> float:
+        return self.instructions / self.elapsed if self.elapsed else 0.0
+
+    def started(self, program: Program) -> None:
+        self.run_start = perf_counter()
+
+    def stopped(self, program: Program) -> None:
+        self.elapsed += perf_counter() - self.run_start
+
+    def stepped(
+        self,
+        program: Program,
+        ptr: int,
+        relative_base: int,
+        instruction: Instruction,
+        elapsed: float) -> None:
+        self.record(ptr, relative_base, instruction, elapsed)
+
+    def ran_block(self, program: Program, ptr: int, n_instructions: int) -> None:
+        self.instructions += n_instructions
+        self.address_hits[ptr] += 1
+
+    def suspended(self, program: Program) -> None:
+        self.suspensions += 1
+
+    def record(self, ptr: int, relative_base: int, instruction: Instruction, elapsed: float) -> None:
+        self.instructions += 1
+        self.opcode_counts[instruction.opcode] += 1
+        self.opcode_times[instruction.opcode] += elapsed
+        self.address_hits[ptr] += 1
+        n_reads = len(instruction.parameters)
+        if instruction.opcode in WRITE_OPCODES:
+            n_reads -= 1
+            self.memory_writes[
+                address(instruction.parameters[-1], instruction.parameter_modes[-1], relative_base)] += 1
+        for parameter, mode in zip(instruction.parameters[:n_reads], instruction.parameter_modes):
+            if mode in (POSITION_MODE, RELATIVE_MODE):
+                self.memory_reads[address(parameter, mode, relative_base)] += 1
+
+    def summary(self) -> Dict:
+        return {
+            'instructions': self.instructions,
+            'elapsed': self.elapsed,
+            'instructions_per_second': self.instructions_per_second,
+            'suspensions': self.suspensions,
+            'opcode_counts': dict(self.opcode_counts),
+            'opcode_times': dict(self.opcode_times),
+            'address_hits': dict(self.address_hits),
+            'memory_reads': dict(self.memory_reads),
+            'memory_writes': dict(self.memory_writes),
+        }
+
+    def rows(self) -> List[Tuple[str, int, float]]:
+        '''Flatten the tables into (table, key, value) rows.'''
+        tables = {
+            'opcode_counts': self.opcode_counts,
+            'opcode_times': self.opcode_times,
+            'address_hits': self.address_hits,
+            'memory_reads': self.memory_reads,
+            'memory_writes': self.memory_writes,
+        }
+        return [
+            (name, key, value)
+            for name, table in tables.items()
+            for key, value in sorted(table.items())]
+
+    def export_json(self, f: IO) -> None:
+        json.dump(self.summary(), f, indent=2)
+
+    def export_csv(self, f: IO) -> None:
+        writer = csv.writer(f)
+        writer.writerow(['table', 'key', 'value'])
+        writer.writerow(['summary', 'instructions', self.instructions])
+        writer.writerow(['summary', 'elapsed', self.elapsed])
+        writer.writerow(['summary', 'instructions_per_second', self.instructions_per_second])
+        writer.writerow(['summary', 'suspensions', self.suspensions])
+        writer.writerows(self.rows())
+
+
+def address(parameter: int, mode: int, relative_base: int) -> int:
+    return relative_base + parameter if mode == RELATIVE_MODE else parameter
+
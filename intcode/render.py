@@ -0,0 +1,152 @@
+'''Incremental drawing of frames to an ANSI terminal.
+
+A frame is a 2D array of characters, as produced by Grid.render or a lookup
+table indexed by an array of tiles. The first frame, or one of a new shape,
+is drawn in full. After that only the cells that differ from the last frame
+drawn are written, each run of changes preceded by a cursor movement, and the
+whole update goes out in a single write. Frames arriving faster than max_fps
+are dropped, the next frame drawn is diffed against the last one shown.
+
+Grids are drawn with draw_grid, which renders and diffs only the region
+written since the grid was last drawn, as given by Grid.take_dirty.
+'''
+import sys
+from time import perf_counter
+from typing import IO, List, Optional, Sequence, Union
+import numpy as np
+
+from intcode.grid import Bounds, ConversionTable, Grid
+
+CLEAR_SCREEN = '\x1b[2J'
+MOVE_CURSOR = '\x1b[{row};{column}H'
+CLEAR_LINE = '\x1b[K'
+# Unchanged gaps this short are rewritten rather than skipped, as that is
+# no longer than the cursor movement that would skip them.
+MAX_REWRITTEN_GAP = 6
+
+Frame = Union[np.ndarray, Sequence[str]]
+
+
+def to_frame(frame: Frame) -> np.ndarray:
+    if isinstance(frame, np.ndarray):
+        return frame
+    width = max((len(line) for line in frame), default=0)
+    return np.array([list(line.ljust(width)) for line in frame], dtype='<U1').reshape(-1, width)
+
+
+class TerminalRenderer:
+
+    def __init__(
+        self,
+        stream: IO=sys.stdout,
+        max_fps: Optional[float]=None,
+        row: int=1,
+        column: int=1):
+        self.stream = stream
+        self.frame_interval = 1 / max_fps if max_fps else 0.0
+        # Terminal position of the frame's top left cell, one based.
+        self.row, self.column = row, column
+        self.previous: Optional[np.ndarray] = None
+        # The bounds of the grid last drawn with draw_grid.
+        self.bounds: Optional[Bounds] = None
+        self.last_draw = float('-inf')
+        self.frames_drawn = 0
+        self.frames_dropped = 0
+
+    def draw(self, frame: Frame, footer: str='', force: bool=False) -> bool:
+        '''Draw frame with a line of text below it, returning whether it was
+        drawn or dropped by the throttle.'''
+        if not self.due(force):
+            self.frames_dropped += 1
+            return False
+        self.last_draw = perf_counter()
+        chars = to_frame(frame)
+        if self.previous is None or self.previous.shape != chars.shape:
+            parts = [CLEAR_SCREEN] + self.full_update(chars)
+        else:
+            parts = self.diff_update(self.previous, chars)
+        self.previous, self.bounds = chars.copy(), None
+        self.write(parts, chars.shape[0], footer)
+        return True
+
+    def draw_grid(
+        self,
+        grid: Grid,
+        conversion_table: ConversionTable,
+        footer: str='',
+        force: bool=False) -> bool:
+        '''Draw the cells within a grid's bounds like draw, rendering only the
+        region written since the grid was last drawn.
+
+        The grid's dirty region is only taken when a frame is drawn, so writes
+        during dropped frames are drawn with the next one.
+        '''
+        if not self.due(force):
+            self.frames_dropped += 1
+            return False
+        if self.previous is None or grid.bounds != self.bounds:
+            grid.take_dirty()
+            drawn = self.draw(grid.render(conversion_table), footer, force=True)
+            self.bounds = grid.bounds
+            return drawn
+        self.last_draw = perf_counter()
+        dirty = grid.take_dirty()
+        parts: List[str] = []
+        if dirty is not None and self.bounds is not None:
+            row, column = dirty[1] - self.bounds[1], dirty[0] - self.bounds[0]
+            chars = grid.render(conversion_table, dirty)
+            region = self.previous[row : row + chars.shape[0], column : column + chars.shape[1]]
+            parts = self.diff_update(region, chars, row, column)
+            region[...] = chars
+        self.write(parts, self.previous.shape[0], footer)
+        return True
+
+    def write(self, parts: List[str], n_rows: int, footer: str) -> None:
+        if footer:
+            parts.append(self.move(n_rows, 0) + footer + CLEAR_LINE)
+        # Leave the cursor below the frame.
+        parts.append(self.move(n_rows + (1 if footer else 0), 0))
+        self.stream.write(''.join(parts))
+        self.stream.flush()
+        self.frames_drawn += 1
+
+    def due(self, force: bool=False) -> bool:
+        '''Whether a frame drawn now would get past the throttle, so callers
+        can skip building frames that would be dropped.'''
+        return force or perf_counter() - self.last_draw >= self.frame_interval
+
+    def move(self, row: int, column: int) -> str:
+        return MOVE_CURSOR.format(row=self.row + row, column=self.column + column)
+
+    def full_update(self, chars: np.ndarray) -> List[str]:
+        return [self.move(row, 0) + ''.join(line) for row, line in enumerate(chars.tolist())]
+
+    def diff_update(
+        self,
+        previous: np.ndarray,
+        chars: np.ndarray,
+        row_offset: int=0,
+        column_offset: int=0) -> List[str]:
+        '''Redraw the cells of chars that differ from previous, both placed
+        at the given offset within the frame.'''
+        parts: List[str] = []
+        rows, columns = np.nonzero(previous != chars)
+        if not rows.size:
+            return parts
+        # Split the changed cells into runs, breaking on a new row or a gap
+        # worth skipping over.
+        breaks = np.flatnonzero(
+            (np.diff(rows) != 0) | (np.diff(columns) > MAX_REWRITTEN_GAP + 1)) + 1
+        starts = np.concatenate(([0], breaks)).tolist()
+        ends = np.concatenate((breaks, [rows.size])).tolist()
+        rows, columns = rows.tolist(), columns.tolist()
+        for start, end in zip(starts, ends):
+            row, first, last = rows[start], columns[start], columns[end - 1]
+            parts.append(
+                self.move(row + row_offset, first + column_offset)
+                + ''.join(chars[row, first : last + 1].tolist()))
+        return parts
+
+    def reset(self) -> None:
+        '''Forget the last frame, so the next is drawn in full.'''
+        self.previous = self.bounds = None
@@ -0,0 +1,148 @@
+'''Shortest path searches over grids and other graphs.
+
+Graphs are given as a neighbors function, returning the nodes adjacent to a
+node, with their step costs for the weighted searches. Breadth first search
+covers unit weight graphs, Dijkstra's algorithm and A* use a binary heap for
+weighted ones. Each search returns the distances it settled and the tree of
+previous nodes, from which paths are read off.
+
+For whole grids, distance_field runs a multi source breadth first search over
+the grid's array, expanding each wavefront with array operations.
+'''
+import heapq
+from collections import deque
+from itertools import count
+from typing import (
+    Callable, Collection, Dict, Hashable, Iterable, List, NamedTuple,
+    Optional, Tuple, TypeVar)
+import numpy as np
+
+from intcode.grid import Grid, Point
+
+Node = TypeVar('Node', bound=Hashable)
+Neighbors = Callable[[Node], Iterable[Node]]
+WeightedNeighbors = Callable[[Node], Iterable[Tuple[Node, int]]]
+
+# Steps to the four orthogonal neighbors of a grid cell.
+STEPS = ((0, 1), (0, -1), (-1, 0), (1, 0))
+UNREACHED = -1
+
+
+class SearchResult(NamedTuple):
+    distances: Dict[Hashable, int]
+    previous: Dict[Hashable, Hashable]
+
+    def path(self, target: Hashable) -> List[Hashable]:
+        '''The nodes stepped through from the search's start to target, not
+        including the start.'''
+        if target not in self.distances:
+            raise ValueError(f"{target} was not reached.")
+        path = []
+        while target in self.previous:
+            path.append(target)
+            target = self.previous[target]
+        return path[::-1]
+
+
+def bfs(
+    starts: Iterable[Node],
+    neighbors: Neighbors,
+    goal: Optional[Node]=None) -> SearchResult:
+    '''Breadth first search from any of starts, stopping early at goal.'''
+    distances = {start: 0 for start in starts}
+    previous: Dict[Node, Node] = {}
+    queue = deque(distances)
+    while queue:
+        node = queue.popleft()
+        if node == goal:
+            break
+        distance = distances[node] + 1
+        for neighbor in neighbors(node):
+            if neighbor not in distances:
+                distances[neighbor] = distance
+                previous[neighbor] = node
+                queue.append(neighbor)
+    return SearchResult(distances, previous)
+
+
+def dijkstra(
+    start: Node,
+    neighbors: WeightedNeighbors,
+    goal: Optional[Node]=None) -> SearchResult:
+    return astar(start, neighbors, goal, heuristic=None)
+
+
+def astar(
+    start: Node,
+    neighbors: WeightedNeighbors,
+    goal: Optional[Node],
+    heuristic: Optional[Callable[[Node], int]]) -> SearchResult:
+    '''A* search, or Dijkstra's algorithm without a heuristic.
+
+    The heuristic must never overestimate the distance to goal. Only the
+    distances of settled nodes are returned.
+    '''
+    best = {start: 0}
+    previous: Dict[Node, Node] = {}
+    settled: Dict[Node, int] = {}
+    # Ties are broken by insertion order, so nodes are never compared.
+    tiebreak = count()
+    heap = [(heuristic(start) if heuristic else 0, next(tiebreak), start)]
+    while heap:
+        _, _, node = heapq.heappop(heap)
+        if node in settled:
+            continue
+        settled[node] = best[node]
+        if node == goal:
+            break
+        for neighbor, cost in neighbors(node):
+            distance = settled[node] + cost
+            if neighbor not in settled and distance < best.get(neighbor, distance + 1):
+                best[neighbor] = distance
+                previous[neighbor] = node
+                estimate = distance + (heuristic(neighbor) if heuristic else 0)
+                heapq.heappush(heap, (estimate, next(tiebreak), neighbor))
+    return SearchResult(settled, {node: previous[node] for node in settled if node in previous})
+
+
+def manhattan(goal: Point) -> Callable[[Point], int]:
+    return lambda point: abs(point[0] - goal[0]) + abs(point[1] - goal[1])
+
+
+def grid_neighbors(grid: Grid, passable: Collection[int]) -> Neighbors[Point]:
+    '''Orthogonal neighbors of a cell holding any of the passable values.'''
+    def neighbors(point: Point) -> List[Point]:
+        x, y = point
+        return [(x + dx, y + dy) for dx, dy in STEPS if grid[(x + dx, y + dy)] in passable]
+    return neighbors
+
+
+def unit_cost(neighbors: Neighbors[Node]) -> WeightedNeighbors[Node]:
+    return lambda node: ((neighbor, 1) for neighbor in neighbors(node))
+
+
+def distance_field(grid: Grid, sources: Iterable[Point], passable: Collection[int]) -> Grid:
+    '''Steps from the nearest source to every cell within the grid's bounds,
+    moving only through passable cells. Cells not reached hold UNREACHED.'''
+    if grid.bounds is None:
+        return Grid(fill=UNREACHED)
+    min_x, min_y = grid.bounds[:2]
+    view = grid.view()
+    height, width = view.shape[0] + 2, view.shape[1] + 2
+    # A border of blocked cells keeps every step inside the array.
+    open_cells = np.zeros((height, width), dtype=bool)
+    open_cells[1:-1, 1:-1] = np.isin(view, list(passable))
+    open_cells = open_cells.ravel()
+    distances = np.full(height * width, UNREACHED, dtype=np.int64)
+    frontier = np.array(
+        [(y - min_y + 1) * width + x - min_x + 1 for x, y in sources], dtype=np.int64)
+    distances[frontier] = 0
+    offsets = np.array([1, -1, width, -width], dtype=np.int64)
+    distance = 0
+    while frontier.size:
+        distance += 1
+        candidates = np.unique((frontier[:, None] + offsets).ravel())
+        frontier = candidates[open_cells[candidates] & (distances[candidates] == UNREACHED)]
+        distances[frontier] = distance
+    field = distances.reshape(height, width)[1:-1, 1:-1]
+    return Grid.from_array(field, min_x, min_y, fill=UNREACHED)
@@ -1,6 +1,8 @@
 from typing import Dict, Tuple, List, Optional, Union
 import numpy as np
 
+from intcode.grid import Grid, ConversionTable, lookup_table
+
 Point = Tuple[int, int]
 
 POSITION_CHAR = '@'
@@ -8,35 +10,27 @@ PATH_CHAR = '.'
 
 
 def draw_map(
-    map: Dict[Point, int], 
-    conversion_table: Union[List[str], Dict[int, str]],
-    position: Optional[Point]=None, 
+    map: Union[Grid, Dict[Point, int]],
+    conversion_table: ConversionTable,
+    position: Optional[Point]=None,
     path: Optional[List[Point]]=None) -> None:
-    if not map:
+    grid = map if isinstance(map, Grid) else Grid.from_dict(map)
+    if grid.bounds is None:
         return
-    minx = min(k[0] for k in map)
-    maxx = max(k[0] for k in map)
-    miny = min(k[1] for k in map)
-    maxy = max(k[1] for k in map)
-    area = np.zeros(shape=(maxx - minx + 1, maxy - miny + 1), dtype=int)
-    for (x, y), id in map.items():
-        area[x - minx,  y - miny] = id
-    strrep = conversion_table[area]
+    minx, miny = grid.bounds[:2]
+    strrep = grid.render(conversion_table)
     if position:
-        strrep[(position[0] - minx, position[1] - miny)] = POSITION_CHAR
+        strrep[position[1] - miny, position[0] - minx] = POSITION_CHAR
     if path:
         for p in path:
-            strrep[p[0] - minx, p[1] - miny] = PATH_CHAR
-    for row in strrep.T:
+            strrep[p[1] - miny, p[0] - minx] = PATH_CHAR
+    for row in strrep:
         print(''.join(row))
 
 
 def draw_array(
     arr: Union[List[int], np.array],
-    conversion_table: Union[List[str], Dict[int, str]]) -> None:
-    arr = np.asarray(arr)
-    if isinstance(conversion_table, dict):
-        conversion_table = np.array([conversion_table[i] for i in range(256)])
-    strrep = conversion_table[arr]
+    conversion_table: ConversionTable) -> None:
+    strrep = lookup_table(conversion_table)[np.asarray(arr)]
     for row in strrep:
-        print(''.join(row))
\ No newline at end of file
+        print(''.join(row))
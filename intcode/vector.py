@@ -0,0 +1,184 @@
+'''A NumPy engine running many instances of one program in lockstep.
+
+The memory of all lanes is held in a single (lanes, memory size) array. Every
+step executes one instruction in each running lane, with lanes grouped by
+opcode so that lanes whose instruction pointers have diverged are still
+handled with array operations. Each lane follows the usual run semantics,
+halting or suspending for input independently of the others.
+
+Memory is fixed size and values are int64, so this suits programs that stay
+within both, like the day 2 and day 7 searches.
+'''
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+
+from intcode.channel import Channel
+from intcode.intcode import (
+    IMMEDIATE_MODE, RELATIVE_MODE,
+    ADD_OP_CODE, MULTIPLY_OP_CODE, INPUT_OPCODE, OUTPUT_OPCODE,
+    JUMP_IF_TRUE_OPCODE, JUMP_IF_FALSE_OPCODE, LESS_THAN_OPCODE,
+    EQUALS_OPCODE, ADJUST_RELATIVE_BASE_OPCODE, HALT_OP_CODE)
+
+# Memory given to each lane beyond the loaded image, unless sized explicitly.
+DEFAULT_HEADROOM = 1024
+
+Lanes = np.ndarray
+
+
+class VectorProgram:
+
+    def __init__(
+        self,
+        code: List[int],
+        n_lanes: int,
+        inputs: Optional[Sequence[Sequence[int]]]=None,
+        memory_size: Optional[int]=None):
+        memory_size = memory_size if memory_size else len(code) + DEFAULT_HEADROOM
+        self.memory = np.zeros(shape=(n_lanes, memory_size), dtype=np.int64)
+        self.memory[:, :len(code)] = code
+        self.instruction_ptr = np.zeros(n_lanes, dtype=np.int64)
+        self.relative_base = np.zeros(n_lanes, dtype=np.int64)
+        self.halted = np.zeros(n_lanes, dtype=bool)
+        # Lanes suspended until they are given input.
+        self.waiting = np.zeros(n_lanes, dtype=bool)
+        self.input = [Channel(lane_input) for lane_input in inputs] if inputs else [
+            Channel() for _ in range(n_lanes)]
+        self.output = [Channel() for _ in range(n_lanes)]
+
+    @property
+    def n_lanes(self) -> int:
+        return self.memory.shape[0]
+
+    def add_input(self, lane: int, *inputs) -> None:
+        for value in inputs:
+            self.input[lane].put(value)
+        self.waiting[lane] = False
+
+    def run(self) -> Tuple['VectorProgram', np.ndarray]:
+        '''Run until every lane has halted or is waiting for input.'''
+        while self.step():
+            pass
+        return self, self.halted
+
+    def step(self) -> bool:
+        '''Execute one instruction in every running lane.
+
+        Returns whether any lane was running.
+        '''
+        lanes = np.flatnonzero(~(self.halted | self.waiting))
+        if not lanes.size:
+            return False
+        full_opcodes = self.gather(lanes, self.instruction_ptr[lanes])
+        opcodes = full_opcodes % 100
+        for opcode in np.unique(opcodes).tolist():
+            operation, n_parameters = VECTOR_OP_CODE_TABLE[opcode]
+            if opcode == opcodes[0] and (opcodes == opcode).all():
+                selected_lanes, selected_opcodes = lanes, full_opcodes
+            else:
+                selected = opcodes == opcode
+                selected_lanes, selected_opcodes = lanes[selected], full_opcodes[selected]
+            operation(self, selected_lanes, *self.parameters(
+                selected_lanes, selected_opcodes, n_parameters))
+        return True
+
+    def parameters(
+        self, lanes: Lanes, full_opcodes: np.ndarray, n_parameters: int) -> List[np.ndarray]:
+        '''The raw parameters followed by their modes.'''
+        ptr = self.instruction_ptr[lanes]
+        parameters = [self.gather(lanes, ptr + i + 1) for i in range(n_parameters)]
+        modes = [(full_opcodes // 10**(i + 2)) % 10 for i in range(n_parameters)]
+        for mode in modes:
+            if (mode > RELATIVE_MODE).any():
+                raise ValueError(f"Unknown parameter mode {mode.max()}.")
+        return parameters + modes
+
+    def gather(
+        self, lanes: Lanes, addresses: np.ndarray, used: Optional[np.ndarray]=None) -> np.ndarray:
+        '''Read one address per lane, checking bounds only where used.'''
+        in_bounds = (addresses >= 0) & (addresses < self.memory.shape[1])
+        if used is not None:
+            in_bounds |= ~used
+        if not in_bounds.all():
+            lane = lanes[~in_bounds][0]
+            raise IndexError(f"Lane {lane} addressed memory out of bounds.")
+        return self.memory[lanes, np.clip(addresses, 0, self.memory.shape[1] - 1)]
+
+    def read(self, lanes: Lanes, parameter: np.ndarray, mode: np.ndarray) -> np.ndarray:
+        addresses = np.where(
+            mode == RELATIVE_MODE, self.relative_base[lanes] + parameter, parameter)
+        values = self.gather(lanes, addresses, used=mode != IMMEDIATE_MODE)
+        return np.where(mode == IMMEDIATE_MODE, parameter, values)
+
+    def write(self, lanes: Lanes, values: np.ndarray, parameter: np.ndarray, mode: np.ndarray) -> None:
+        if (mode == IMMEDIATE_MODE).any():
+            raise ValueError(f"Cannot write with parameter mode {IMMEDIATE_MODE}")
+        addresses = np.where(
+            mode == RELATIVE_MODE, self.relative_base[lanes] + parameter, parameter)
+        self.gather(lanes, addresses)
+        self.memory[lanes, addresses] = values
+
+
+# Vectorized opcode implementations.
+def vector_add(program: VectorProgram, lanes: Lanes, p1, p2, p3, m1, m2, m3) -> None:
+    program.write(lanes, program.read(lanes, p1, m1) + program.read(lanes, p2, m2), p3, m3)
+    program.instruction_ptr[lanes] += 4
+
+def vector_multiply(program: VectorProgram, lanes: Lanes, p1, p2, p3, m1, m2, m3) -> None:
+    program.write(lanes, program.read(lanes, p1, m1) * program.read(lanes, p2, m2), p3, m3)
+    program.instruction_ptr[lanes] += 4
+
+def vector_input(program: VectorProgram, lanes: Lanes, p1, m1) -> None:
+    has_input = np.array([bool(program.input[lane]) for lane in lanes.tolist()], dtype=bool)
+    # Lanes without input suspend on this instruction.
+    program.waiting[lanes[~has_input]] = True
+    lanes, p1, m1 = lanes[has_input], p1[has_input], m1[has_input]
+    values = np.array([program.input[lane].get() for lane in lanes.tolist()], dtype=np.int64)
+    program.write(lanes, values, p1, m1)
+    program.instruction_ptr[lanes] += 2
+
+def vector_output(program: VectorProgram, lanes: Lanes, p1, m1) -> None:
+    values = program.read(lanes, p1, m1)
+    for lane, value in zip(lanes.tolist(), values.tolist()):
+        program.output[lane].put(value)
+    program.instruction_ptr[lanes] += 2
+
+def vector_jump_if_true(program: VectorProgram, lanes: Lanes, p1, p2, m1, m2) -> None:
+    condition = program.read(lanes, p1, m1) != 0
+    program.instruction_ptr[lanes] = np.where(
+        condition, program.read(lanes, p2, m2), program.instruction_ptr[lanes] + 3)
+
+def vector_jump_if_false(program: VectorProgram, lanes: Lanes, p1, p2, m1, m2) -> None:
+    condition = program.read(lanes, p1, m1) == 0
+    program.instruction_ptr[lanes] = np.where(
+        condition, program.read(lanes, p2, m2), program.instruction_ptr[lanes] + 3)
+
+def vector_less_than(program: VectorProgram, lanes: Lanes, p1, p2, p3, m1, m2, m3) -> None:
+    values = (program.read(lanes, p1, m1) < program.read(lanes, p2, m2)).astype(np.int64)
+    program.write(lanes, values, p3, m3)
+    program.instruction_ptr[lanes] += 4
+
+def vector_equals(program: VectorProgram, lanes: Lanes, p1, p2, p3, m1, m2, m3) -> None:
+    values = (program.read(lanes, p1, m1) == program.read(lanes, p2, m2)).astype(np.int64)
+    program.write(lanes, values, p3, m3)
+    program.instruction_ptr[lanes] += 4
+
+def vector_adjust_relative_base(program: VectorProgram, lanes: Lanes, p1, m1) -> None:
+    program.relative_base[lanes] += program.read(lanes, p1, m1)
+    program.instruction_ptr[lanes] += 2
+
+def vector_halt(program: VectorProgram, lanes: Lanes) -> None:
+    program.halted[lanes] = True
+
+
+VECTOR_OP_CODE_TABLE: Dict[int, Tuple[Callable[..., None], int]] = {
+    ADD_OP_CODE: (vector_add, 3),
+    MULTIPLY_OP_CODE: (vector_multiply, 3),
+    INPUT_OPCODE: (vector_input, 1),
+    OUTPUT_OPCODE: (vector_output, 1),
+    JUMP_IF_TRUE_OPCODE: (vector_jump_if_true, 2),
+    JUMP_IF_FALSE_OPCODE: (vector_jump_if_false, 2),
+    LESS_THAN_OPCODE: (vector_less_than, 3),
+    EQUALS_OPCODE: (vector_equals, 3),
+    ADJUST_RELATIVE_BASE_OPCODE: (vector_adjust_relative_base, 1),
+    HALT_OP_CODE: (vector_halt, 0)
+}